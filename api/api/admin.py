@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Empresa, Cliente, Produto, Orcamento, ItemOrcamento, Usuario, DTFVendor, PedidoFabrica
+from .models import Empresa, Cliente, Produto, Orcamento, ItemOrcamento, Usuario, DTFVendor, PedidoFabrica, ResumoMensal, PDFJob
 
 
 class ItemOrcamentoInline(admin.TabularInline):
@@ -10,8 +10,16 @@ class ItemOrcamentoInline(admin.TabularInline):
 @admin.register(Orcamento)
 class OrcamentoAdmin(admin.ModelAdmin):
     list_display = ('id', 'empresa', 'cliente', 'data_criacao', 'valor_total')
+    list_select_related = ('empresa', 'cliente')
     inlines = [ItemOrcamentoInline]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).com_valor_total()
+
+    @admin.display(description='Valor total', ordering='valor_total')
+    def valor_total(self, obj):
+        return obj.valor_total
+
 
 admin.site.register(Empresa)
 admin.site.register(Cliente)
@@ -19,3 +27,16 @@ admin.site.register(Produto)
 admin.site.register(Usuario)
 admin.site.register(DTFVendor)
 admin.site.register(PedidoFabrica)
+
+
+@admin.register(ResumoMensal)
+class ResumoMensalAdmin(admin.ModelAdmin):
+    list_display = ('mes', 'tipo_produto', 'esta_pago', 'total_pedidos', 'valor_total', 'unidades')
+    list_filter = ('tipo_produto', 'esta_pago')
+
+
+@admin.register(PDFJob)
+class PDFJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tipo', 'status', 'progresso', 'usuario', 'criado_em', 'expira_em')
+    list_filter = ('tipo', 'status')
+    readonly_fields = ('criado_em', 'concluido_em')
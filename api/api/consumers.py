@@ -6,29 +6,36 @@ from urllib.parse import parse_qs
 
 logger = logging.getLogger(__name__)
 
+async def autenticar(consumer):
+    """Valida o JWT do ?token= e guarda o usuário no consumer. Fecha a conexão se inválido."""
+    query_string = consumer.scope.get('query_string', b'').decode()
+    params = parse_qs(query_string)
+    token_list = params.get('token', [])
+    token = token_list[0] if token_list else None
+
+    if not token:
+        logger.warning("[WS] Conexão rejeitada: sem token")
+        await consumer.close(code=4001)
+        return False
+
+    try:
+        from rest_framework_simplejwt.tokens import AccessToken
+        access_token = AccessToken(token)
+        user_id = access_token['user_id']
+        from django.contrib.auth import get_user_model
+        User = get_user_model()
+        from asgiref.sync import sync_to_async
+        consumer.user = await sync_to_async(User.objects.get)(id=user_id)
+    except Exception as e:
+        logger.warning(f"[WS] Conexão rejeitada: token inválido - {e}")
+        await consumer.close(code=4001)
+        return False
+    return True
+
+
 class WhatsAppConsumer(AsyncWebsocketConsumer):
     async def connect(self):
-        query_string = self.scope.get('query_string', b'').decode()
-        params = parse_qs(query_string)
-        token_list = params.get('token', [])
-        token = token_list[0] if token_list else None
-
-        if not token:
-            logger.warning("[WS] Conexão rejeitada: sem token")
-            await self.close(code=4001)
-            return
-
-        try:
-            from rest_framework_simplejwt.tokens import AccessToken
-            access_token = AccessToken(token)
-            user_id = access_token['user_id']
-            from django.contrib.auth import get_user_model
-            User = get_user_model()
-            from asgiref.sync import sync_to_async
-            self.user = await sync_to_async(User.objects.get)(id=user_id)
-        except Exception as e:
-            logger.warning(f"[WS] Conexão rejeitada: token inválido - {e}")
-            await self.close(code=4001)
+        if not await autenticar(self):
             return
 
         self.group_name = 'whatsapp_messages'
@@ -141,3 +148,47 @@ class WhatsAppConsumer(AsyncWebsocketConsumer):
         msg_data = {k: v for k, v in event.items() if k != 'type'}
         await self.send(text_data=json.dumps(msg_data))
         logger.info(f"[WS] Mensagem enviada para {self.channel_name}")
+
+
+class KDSConsumer(AsyncWebsocketConsumer):
+    """
+    Painel KDS em tempo real: manda o snapshot completo ao conectar e depois
+    só os deltas (registro que mudou de fila), publicados pelos signals.
+    """
+
+    async def connect(self):
+        # Aceita antes de validar: fechado no handshake o navegador só vê 1006,
+        # e o painel precisa do 4001 para saber que deve renovar o token
+        await self.accept()
+        if not await autenticar(self):
+            return
+
+        from api.services.kds_service import KDSService
+        self.group_name = KDSService.GRUPO
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.enviar_snapshot()
+        logger.info(f"[WS KDS] Cliente conectado: {self.channel_name}")
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        logger.info(f"[WS KDS] Cliente desconectado: {self.channel_name}")
+
+    async def receive(self, text_data):
+        # O front pede um snapshot novo na virada do dia ou quando a lista de urgentes esvazia
+        try:
+            data = json.loads(text_data)
+        except ValueError:
+            return
+        if data.get('type') == 'snapshot':
+            await self.enviar_snapshot()
+
+    async def enviar_snapshot(self):
+        from asgiref.sync import sync_to_async
+        from api.services.kds_service import KDSService
+        from rest_framework.utils.encoders import JSONEncoder
+        snapshot = await sync_to_async(KDSService.snapshot)()
+        await self.send(text_data=json.dumps({'type': 'snapshot', 'data': snapshot}, cls=JSONEncoder))
+
+    async def kds_delta(self, event):
+        await self.send(text_data=json.dumps({**event, 'type': 'delta'}))
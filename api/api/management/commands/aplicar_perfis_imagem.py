@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from api.services.image_pipeline_service import ImagePipelineService
+
+
+class Command(BaseCommand):
+    help = (
+        'Aplica os perfis de imagem aos arquivos já enviados (layouts e comprovantes) '
+        'e mostra quantos bytes cada perfil economiza. Também preenche os metadados '
+        '(<campo>_meta) dos registros antigos. Use --simular para só medir.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--simular', action='store_true', help='Só mede a economia, sem alterar arquivos')
+        parser.add_argument('--perfil', choices=sorted(ImagePipelineService.PERFIS), help='Apenas um perfil')
+
+    def handle(self, *args, **options):
+        totais = {}
+        for (modelo, campo), (nome_perfil, _) in ImagePipelineService.CAMPOS.items():
+            if options['perfil'] and options['perfil'] != nome_perfil:
+                continue
+            total = totais.setdefault(nome_perfil, [0, 0, 0])
+            registros = modelo.objects.exclude(**{campo: ''}).exclude(**{f'{campo}__isnull': True})
+            for pk, nome in registros.values_list('pk', campo).iterator():
+                resultado = ImagePipelineService.processar(modelo, pk, campo, nome, simular=options['simular'])
+                if resultado is None:
+                    continue
+                total[0] += 1
+                total[1] += resultado[0]
+                total[2] += resultado[1]
+
+        for nome_perfil, (arquivos, antes, depois) in totais.items():
+            economia = antes - depois
+            pct = round(economia / antes * 100, 1) if antes else 0
+            self.stdout.write(f'{nome_perfil}: {arquivos} arquivos, {antes / 1024 / 1024:.1f} MB -> '
+                              f'{depois / 1024 / 1024:.1f} MB (economia {economia / 1024 / 1024:.1f} MB, {pct}%)')
+        self.stdout.write(self.style.SUCCESS('OK. (simulação)' if options['simular'] else 'OK.'))
@@ -0,0 +1,77 @@
+import json
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from api.tools.pdf_benchmark import PDFBenchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a renderização de todos os templates de PDF com dados sintéticos '
+        '(itens, grades e imagens de vários tamanhos): p50/p95, pico de RSS do worker e '
+        'tamanho do arquivo. Compara com o baseline salvo (--salvar grava um novo).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iteracoes', type=int, default=10, help='Execuções medidas por cenário')
+        parser.add_argument('--cenario', help="Só os cenários que contêm o texto (ex.: 'pedido/')")
+        parser.add_argument('--baseline', default=os.path.join(settings.BASE_DIR, 'benchmarks', 'pdf_baseline.json'),
+                            help='Arquivo JSON do baseline')
+        parser.add_argument('--salvar', action='store_true', help='Grava o resultado como novo baseline')
+        parser.add_argument('--tolerancia', type=float, default=15.0,
+                            help='Piora máxima do p95 (%%) antes de acusar regressão')
+        parser.add_argument('--estrito', action='store_true', help='Sai com erro se houver regressão')
+
+    def handle(self, *args, **options):
+        if options['iteracoes'] < 1:
+            raise CommandError('--iteracoes deve ser pelo menos 1')
+
+        baseline = {}
+        if os.path.exists(options['baseline']):
+            with open(options['baseline']) as f:
+                baseline = json.load(f).get('cenarios', {})
+
+        self.stdout.write(f"{'cenário':<42} {'p50 ms':>9} {'p95 ms':>9} {'frio ms':>9} {'RSS MB':>8} {'KB':>8}")
+
+        def ao_medir(nome, m):
+            linha = (f"{nome:<42} {m['p50_ms']:>9} {m['p95_ms']:>9} {m['frio_ms']:>9} "
+                     f"{m['rss_mb']:>8} {m['bytes'] // 1024:>8}")
+            base = baseline.get(nome)
+            if base:
+                linha += (f"   (base p50 {base['p50_ms']} / p95 {base['p95_ms']} ms, "
+                          f"{base['rss_mb']} MB, {base['bytes'] // 1024} KB)")
+            self.stdout.write(linha)
+
+        resultados = PDFBenchmark.executar(options['iteracoes'], options['cenario'], ao_medir)
+        if not resultados:
+            raise CommandError('Nenhum cenário corresponde ao filtro.')
+
+        regressoes = []
+        if baseline:
+            deltas, regressoes = PDFBenchmark.comparar(resultados, baseline, options['tolerancia'])
+            self.stdout.write('\nVariação contra o baseline (%):')
+            for nome, delta in deltas.items():
+                self.stdout.write(
+                    f"  {nome:<42} p50 {delta['p50_ms']:+}  p95 {delta['p95_ms']:+}  "
+                    f"RSS {delta['rss_mb']:+}  tamanho {delta['bytes']:+}"
+                    if None not in delta.values() else f"  {nome:<42} {delta}")
+            for nome in regressoes:
+                self.stdout.write(self.style.WARNING(f'  REGRESSÃO: {nome} (p95 acima de {options["tolerancia"]}%)'))
+
+        if options['salvar']:
+            os.makedirs(os.path.dirname(options['baseline']) or '.', exist_ok=True)
+            if baseline:
+                # Salvando só parte dos cenários: mantém os demais do baseline anterior
+                resultados = {**baseline, **resultados}
+            with open(options['baseline'], 'w') as f:
+                json.dump({
+                    'gerado_em': timezone.now().isoformat(),
+                    'iteracoes': options['iteracoes'],
+                    'cenarios': resultados,
+                }, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"Baseline salvo em {options['baseline']}"))
+
+        if regressoes and options['estrito']:
+            raise CommandError(f'{len(regressoes)} cenário(s) com regressão de p95.')
+        self.stdout.write(self.style.SUCCESS('OK.'))
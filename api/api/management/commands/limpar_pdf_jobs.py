@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api.services.pdf_job_service import PDFJobService
+
+
+class Command(BaseCommand):
+    help = 'Remove os jobs de PDF expirados (PDF_JOB_TTL) e os arquivos gerados'
+
+    def handle(self, *args, **options):
+        removidos = PDFJobService.limpar_expirados()
+        self.stdout.write(self.style.SUCCESS(f'OK. {removidos} jobs removidos.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from api.services.rollup_service import RollupService
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o ResumoMensal (consolidado mensal de DTF e PedidoFabrica) a partir dos pedidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ano', type=int, help='Reconstrói apenas o ano informado')
+        parser.add_argument('--tipo', dest='tipo_produto', help="Reconstrói apenas um tipo_produto (ou 'pedido_fabrica')")
+
+    def handle(self, *args, **options):
+        linhas = RollupService.rebuild(ano=options['ano'], tipo_produto=options['tipo_produto'])
+        self.stdout.write(self.style.SUCCESS(f'OK. {linhas} linhas de resumo geradas.'))
@@ -0,0 +1,52 @@
+from datetime import datetime, time, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import Round
+from django.utils import timezone
+from api.models import DTFVendor
+from api.services.pricing_service import PricingService
+from api.services.rollup_service import RollupService
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula o valor_total congelado dos DTFVendor com a configuração de preços atual, '
+        'em um único UPDATE. Sem filtros, reprecifica tudo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--de', help='Data inicial (AAAA-MM-DD), inclusive')
+        parser.add_argument('--ate', help='Data final (AAAA-MM-DD), inclusive')
+        parser.add_argument('--tipo', dest='tipo_produto', help='Reprecifica apenas um tipo_produto')
+        parser.add_argument('--pendentes', action='store_true',
+                            help='Apenas pedidos sem valor_total (backfill)')
+
+    def _data(self, valor, fim=False):
+        try:
+            dia = datetime.strptime(valor, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Data inválida: {valor} (use AAAA-MM-DD)')
+        if fim:
+            dia += timedelta(days=1)
+        return timezone.make_aware(datetime.combine(dia, time.min))
+
+    def handle(self, *args, **options):
+        qs = DTFVendor.objects.all()
+        if options['de']:
+            qs = qs.filter(data_criacao__gte=self._data(options['de']))
+        if options['ate']:
+            qs = qs.filter(data_criacao__lt=self._data(options['ate'], fim=True))
+        if options['tipo_produto']:
+            qs = qs.filter(tipo_produto=options['tipo_produto'])
+        if options['pendentes']:
+            qs = qs.filter(valor_total__isnull=True)
+
+        anos = sorted({d.year for d in qs.dates('data_criacao', 'year')})
+        atualizados = qs.update(valor_total=Round(PricingService.valor_total_expression(), 2))
+        self.stdout.write(f'{atualizados} DTFs reprecificados.')
+
+        # update() não dispara signals: refaz o resumo mensal dos anos afetados
+        for ano in anos:
+            RollupService.rebuild(ano=ano)
+            self.stdout.write(f'Resumo mensal de {ano} reconstruído.')
+
+        self.stdout.write(self.style.SUCCESS('OK.'))
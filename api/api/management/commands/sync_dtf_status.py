@@ -1,17 +1,17 @@
 from django.core.management.base import BaseCommand
-from api.models import DTFVendor
+from api.services.status_service import StatusService
 
 
 class Command(BaseCommand):
     help = 'Sincroniza o campo status de todos os DTFVendor com base nos flags esta_pago, foi_impresso e foi_entregue'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk', type=int, default=StatusService.CHUNK_SIZE,
+                            help='Quantidade de ids por UPDATE')
+
     def handle(self, *args, **options):
-        dtfs = DTFVendor.objects.all()
-        atualizados = 0
-        for dtf in dtfs:
-            old_status = dtf.status
-            dtf.atualizar_status()
-            if dtf.status != old_status:
-                dtf.save(update_fields=['status'])
-                atualizados += 1
-        self.stdout.write(self.style.SUCCESS(f'OK. {atualizados} de {dtfs.count()} DTFs atualizados.'))
\ No newline at end of file
+        def progresso(ate_pk, max_pk, atualizados):
+            self.stdout.write(f'  id <= {ate_pk} de {max_pk}: {atualizados} atualizados')
+
+        total, atualizados = StatusService.sincronizar_dtf(options['chunk'], progresso)
+        self.stdout.write(self.style.SUCCESS(f'OK. {atualizados} de {total} DTFs atualizados.'))
@@ -1,9 +1,11 @@
 from django.utils import timezone
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
 import os
 import random
+import uuid
 import string
 
 
@@ -84,6 +86,24 @@ class Produto(models.Model):
         return self.nome
 
 
+class OrcamentoQuerySet(models.QuerySet):
+    def com_valor_total(self):
+        """
+        Anota valor_total = soma de quantidade * preco_negociado dos itens.
+        Feito por subquery para não multiplicar linhas quando o queryset
+        também filtra/junta por itens (ex.: busca por itens__produto__nome).
+        """
+        itens = ItemOrcamento.objects.filter(orcamento=models.OuterRef('pk')).order_by().values(
+            'orcamento'
+        ).annotate(
+            total=models.Sum(models.F('quantidade') * models.F('preco_negociado'))
+        ).values('total')
+        return self.annotate(valor_total=Coalesce(
+            models.Subquery(itens), models.Value(Decimal('0.00')),
+            output_field=models.DecimalField(max_digits=14, decimal_places=2),
+        ))
+
+
 class Orcamento(models.Model):
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
     cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE)
@@ -93,11 +113,21 @@ class Orcamento(models.Model):
     campanha = models.CharField(max_length=255, null=True, blank=True)
     data_print = models.DateTimeField(null=True, blank=True)
 
+    objects = OrcamentoQuerySet.as_manager()
+
     @property
     def valor_total(self):
+        # Vem pronto do banco quando o queryset usa .com_valor_total()
+        anotado = self.__dict__.get('_valor_total')
+        if anotado is not None:
+            return anotado
         # Usamos 'itens' porque é o related_name que definimos abaixo
         return sum(item.subtotal for item in self.itens.all())
 
+    @valor_total.setter
+    def valor_total(self, value):
+        self._valor_total = value
+
 
 class ItemOrcamento(models.Model):
     orcamento = models.ForeignKey(
@@ -184,17 +214,54 @@ class DTFVendor(models.Model):
 
     comprovante_pagamento = models.ImageField(
         upload_to=path_comprovante_dtf, null=True, blank=True)
+    # Largura/altura/orientação/DPI/bytes de cada arquivo, gravados pelo pipeline de imagens
+    layout_arquivo_meta = models.JSONField(default=dict, blank=True, editable=False)
+    comprovante_pagamento_meta = models.JSONField(default=dict, blank=True, editable=False)
+
+    valor_total = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True, editable=False,
+        help_text="Preço congelado no momento do pedido (recalculado só quando mudam os dados de preço). "
+                  "Reprecificação em massa: manage.py reprice_dtf")
+
+    CAMPOS_PRECO = ('tipo_produto', 'unidade', 'tamanho_cm', 'quantidade', 'preco_unit_override')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._preco_original = instance._dados_preco()
+        return instance
+
+    def _dados_preco(self):
+        # Campos adiados (.only/.defer) não estão no __dict__: não dá para comparar
+        if any(campo not in self.__dict__ for campo in self.CAMPOS_PRECO):
+            return None
+        return tuple(self.__dict__[campo] for campo in self.CAMPOS_PRECO)
+
+    # Regras do status, em ordem de prioridade: (flags, status). Usadas tanto no
+    # save (atualizar_status) quanto na sincronização em massa (status_expression)
+    REGRAS_STATUS = (
+        ({'foi_entregue': True}, 'finalizado'),
+        ({'esta_pago': False}, 'orcamento'),
+        ({'foi_impresso': 'impresso'}, 'em_producao'),
+    )
+    STATUS_PADRAO = 'aprovado'
 
     def atualizar_status(self):
         """Atualiza o status automaticamente baseado nos flags."""
-        if self.foi_entregue:
-            self.status = "finalizado"
-        elif not self.esta_pago:
-            self.status = "orcamento"
-        elif self.foi_impresso == "impresso":
-            self.status = "em_producao"
-        else:
-            self.status = "aprovado"
+        for flags, status in self.REGRAS_STATUS:
+            if all(getattr(self, campo) == valor for campo, valor in flags.items()):
+                self.status = status
+                return
+        self.status = self.STATUS_PADRAO
+
+    @classmethod
+    def status_expression(cls):
+        """Mesmas regras do atualizar_status() como Case/When, para UPDATE em massa."""
+        return models.Case(
+            *[models.When(then=models.Value(status), **flags) for flags, status in cls.REGRAS_STATUS],
+            default=models.Value(cls.STATUS_PADRAO),
+            output_field=models.CharField(),
+        )
 
     def save(self, *args, **kwargs):
         if self.tipo_produto in ('dtf_textil', 'dtf_uv'):
@@ -206,18 +273,27 @@ class DTFVendor(models.Model):
             if not self.quantidade:
                 self.quantidade = 1
         self.atualizar_status()
+
+        # Congela o preço: só recalcula em pedido novo, sem snapshot
+        # ou quando algum dado que entra no preço mudou
+        original = getattr(self, '_preco_original', None)
+        atual = self._dados_preco()
+        if self._state.adding or self.valor_total is None or (original is not None and original != atual):
+            # Arredonda como a coluna (e o Round do reprice_dtf): o instance fica igual ao banco
+            self.valor_total = Decimal(self.calcular_valor_total()).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'valor_total' not in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'valor_total']
+
         super().save(*args, **kwargs)
+        self._preco_original = self._dados_preco()
 
-    def valor_total(self):
-        from django.conf import settings
-        from .models import DTFConfig
-        try:
-            config = DTFConfig.objects.get(tipo_produto=self.tipo_produto)
-            preco_por_metro = config.valor_metro
-            preco_minimo = config.preco_minimo
-        except DTFConfig.DoesNotExist:
-            preco_por_metro = Decimal('35.00')
-            preco_minimo = Decimal('20.00')
+    def calcular_valor_total(self):
+        # Tabela de preços em memória (recarregada quando algum DTFConfig muda)
+        from .services.pricing_service import PricingService
+        precos = PricingService.precos(self.tipo_produto)
+        preco_por_metro = precos['valor_metro']
+        preco_minimo = precos['preco_minimo']
 
         # Aplicar override por pedido: se preenchido, sobrescreve o preço base
         # para todos os tipos (estampa = valor por unidade, demais = valor por metro)
@@ -229,11 +305,7 @@ class DTFVendor(models.Model):
             # senão usa o valor_unidade da config
             if self.preco_unit_override is not None:
                 return self.preco_unit_override * (self.quantidade or 1)
-            try:
-                valor_un = config.valor_unidade
-            except AttributeError:
-                valor_un = Decimal('0.00')
-            return valor_un * (self.quantidade or 1)
+            return precos['valor_unidade'] * (self.quantidade or 1)
 
         if self.unidade == 'm2':
             # Sublimação: tamanho_cm é tratado como cm², converter para m²
@@ -252,6 +324,17 @@ class DTFVendor(models.Model):
         tipo = dict(self.TIPOS_PRODUTO).get(self.tipo_produto, '')
         return f"{self.cliente.nome} - {self.tamanho_cm}cm ({self.get_foi_impresso_display()}) [{tipo}]"
 
+    class Meta:
+        indexes = [
+            # Filas do KDS: pagos / entregues / impressos do dia
+            models.Index(fields=['esta_pago', 'foi_entregue', 'foi_impresso', 'data_criacao'],
+                         name='dtf_kds_idx'),
+            models.Index(fields=['data_criacao'], name='dtf_data_criacao_idx'),
+            # Urgentes: pagos e não entregues, por data
+            models.Index(fields=['data_criacao'], name='dtf_pago_nao_entregue_idx',
+                         condition=models.Q(esta_pago=True, foi_entregue=False)),
+        ]
+
 
 class DTFConfig(models.Model):
     TIPOS_PRODUTO = (
@@ -318,6 +401,7 @@ class PedidoFabrica(models.Model):
     detalhes_tamanho = models.JSONField(
         default=dict, help_text="Grade de tamanhos ou quantidade única")
     layout = models.FileField(upload_to=path_layout, null=False, blank=False)
+    layout_meta = models.JSONField(default=dict, blank=True, editable=False)
     data_criacao = models.DateTimeField(auto_now_add=True)
     data_entrega = models.DateTimeField(null=True, blank=True)
     status = models.CharField(
@@ -329,6 +413,87 @@ class PedidoFabrica(models.Model):
     def __str__(self):
         return f"{self.cliente.nome} - {self.descricao} ({self.get_status_display()})"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'data_criacao'], name='pedido_status_data_idx'),
+            models.Index(fields=['data_criacao'], name='pedido_data_criacao_idx'),
+            # Urgentes do KDS: pendentes antigos
+            models.Index(fields=['data_criacao'], name='pedido_pendente_idx',
+                         condition=models.Q(status='pendente')),
+        ]
+
+
+class ResumoMensal(models.Model):
+    """
+    Consolidado mensal de DTFVendor e PedidoFabrica, mantido incrementalmente
+    pelos signals de save/delete (ver services/rollup_service.py).
+    PedidoFabrica entra com tipo_produto='pedido_fabrica' e esta_pago=False.
+    """
+    TIPO_PEDIDO_FABRICA = 'pedido_fabrica'
+
+    mes = models.DateField(help_text="Primeiro dia do mês (horário local)")
+    tipo_produto = models.CharField(max_length=20)
+    esta_pago = models.BooleanField(default=False)
+
+    total_pedidos = models.IntegerField(default=0)
+    valor_total = models.DecimalField(max_digits=14, decimal_places=4, default=Decimal('0'))
+    tamanho_cm = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    metros_lineares = models.DecimalField(max_digits=14, decimal_places=4, default=Decimal('0'))
+    metros_quadrados = models.DecimalField(max_digits=14, decimal_places=4, default=Decimal('0'))
+    unidades = models.IntegerField(default=0, help_text="Unidades de estampa ou peças do pedido de fábrica")
+
+    class Meta:
+        verbose_name = 'Resumo Mensal'
+        verbose_name_plural = 'Resumos Mensais'
+        ordering = ['mes', 'tipo_produto', 'esta_pago']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['mes', 'tipo_produto', 'esta_pago'], name='resumo_mensal_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.mes:%m/%Y} - {self.tipo_produto} ({'pago' if self.esta_pago else 'não pago'})"
+
+
+class PDFJob(models.Model):
+    """
+    Geração de PDF em segundo plano (documentos grandes / lotes).
+    O arquivo pronto fica em PDF_JOBS_DIR até expira_em (PDF_JOB_TTL).
+    """
+    STATUS_CHOICES = (
+        ('pendente', 'Pendente'),
+        ('processando', 'Processando'),
+        ('concluido', 'Concluído'),
+        ('erro', 'Erro'),
+    )
+    TIPOS = (
+        ('orcamento', 'Orçamento'),
+        ('dtf', 'DTF'),
+        ('pedido', 'Pedido de Fábrica'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    usuario = models.ForeignKey(Usuario, null=True, blank=True, on_delete=models.SET_NULL)
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    ids = models.JSONField(default=list, help_text="Ids dos documentos, na ordem de impressão")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pendente')
+    progresso = models.PositiveSmallIntegerField(default=0, help_text="0 a 100")
+    erro = models.TextField(blank=True, default='')
+    nome_arquivo = models.CharField(max_length=255)
+    arquivo = models.CharField(max_length=500, blank=True, default='', help_text="Caminho do PDF pronto")
+    criado_em = models.DateTimeField(auto_now_add=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+    expira_em = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['expira_em']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.ids} ({self.get_status_display()})"
+
 
 class WhatsAppInstance(models.Model):
     STATUS_CHOICES = (
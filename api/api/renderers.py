@@ -0,0 +1,34 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class _ExportRenderer(BaseRenderer):
+    """
+    Renderer "de passagem": só existe para o DRF aceitar ?format=csv/xlsx/ndjson.
+    A view devolve a resposta pronta (streaming) via ExportService.
+    Erros do próprio DRF (401, 400, 404...) chegam aqui como dict: vão em JSON.
+    """
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if (response is not None and response.status_code >= 400) or not isinstance(data, (bytes, str)):
+            if response is not None:
+                response['Content-Type'] = 'application/json'
+            return JSONRenderer().render(data)
+        return data
+
+
+class CSVRenderer(_ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class XLSXRenderer(_ExportRenderer):
+    media_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    format = 'xlsx'
+
+
+class NDJSONRenderer(_ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
@@ -1,9 +1,6 @@
-from PIL import Image
-from django.core.files.base import ContentFile
-import io
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
-from .models import Empresa, Cliente, Produto, Orcamento, ItemOrcamento, Usuario, DTFVendor, PedidoFabrica, DTFConfig, ConfiguracaoLoja
+from .models import Empresa, Cliente, Produto, Orcamento, ItemOrcamento, Usuario, DTFVendor, PedidoFabrica, DTFConfig, ConfiguracaoLoja, PDFJob
 
 
 class EmpresaSerializer(serializers.ModelSerializer):
@@ -66,6 +63,8 @@ class OrcamentoSerializer(serializers.ModelSerializer):
             instance.itens.all().delete()
             for item in itens_data:
                 ItemOrcamento.objects.create(orcamento=instance, **item)
+            # Itens mudaram: descarta o valor_total anotado pelo queryset
+            instance.valor_total = None
 
         return instance
 
@@ -138,7 +137,8 @@ class DTFVendorSerializer(serializers.ModelSerializer):
             'id', 'cliente', 'nome_cliente', 'layout_arquivo', 'tamanho_cm',
             'data_criacao', 'foi_impresso', 'esta_pago', 'foi_entregue',
             'comprovante_pagamento', 'valor_total', 'tipo_produto', 'tipo_produto_display', 'unidade',
-            'status', 'status_display', 'quantidade', 'preco_unit_override'
+            'status', 'status_display', 'quantidade', 'preco_unit_override',
+            'layout_arquivo_meta', 'comprovante_pagamento_meta'
         ]
 
     def get_tipo_produto_display(self, obj):
@@ -153,40 +153,6 @@ class DTFConfigSerializer(serializers.ModelSerializer):
         model = DTFConfig
         fields = '__all__'
 
-    def validate_layout_arquivo(self, value):
-        """Comprime o layout mantendo a qualidade para impressão DTF."""
-        if value:
-            return self.comprimir_imagem(value, qualidade=85, max_width=2500)
-        return value
-
-    def validate_comprovante_pagamento(self, value):
-        """Comprime agressivamente o comprovante para economizar espaço."""
-        if value:
-            # Comprovantes podem ser bem menores e em preto e branco se preferir
-            return self.comprimir_imagem(value, qualidade=50, max_width=1200)
-        return value
-
-    def comprimir_imagem(self, imagem_input, qualidade=70, max_width=None):
-        img = Image.open(imagem_input)
-
-        # Converte RGBA para RGB para permitir salvamento em JPEG (mais leve)
-        if img.mode in ("RGBA", "P"):
-            img = img.convert("RGB")
-
-        # Redimensiona se for uma imagem gigantesca (opcional)
-        if max_width and img.width > max_width:
-            ratio = max_width / float(img.width)
-            new_height = int(float(img.height) * float(ratio))
-            img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-
-        # Salva a imagem comprimida em memória
-        buffer = io.BytesIO()
-        img.save(buffer, format='JPEG', quality=qualidade, optimize=True)
-        buffer.seek(0)
-
-        # Retorna o arquivo pronto para o Django
-        return ContentFile(buffer.read(), name=f"{imagem_input.name.split('.')[0]}.jpg")
-
 
 class UserMeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -248,3 +214,42 @@ class ConfiguracaoLojaSerializer(serializers.ModelSerializer):
         if len(normalized) > 15:
             raise serializers.ValidationError("Cidade deve ter no máximo 15 caracteres.")
         return normalized
+
+
+class PDFJobSerializer(serializers.ModelSerializer):
+    status_url = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PDFJob
+        fields = ['id', 'tipo', 'ids', 'status', 'progresso', 'erro', 'nome_arquivo',
+                  'criado_em', 'concluido_em', 'expira_em', 'status_url', 'download_url']
+        read_only_fields = ['status', 'progresso', 'erro', 'nome_arquivo',
+                            'criado_em', 'concluido_em', 'expira_em']
+
+    def _url(self, nome, obj):
+        from django.urls import reverse
+        url = reverse(nome, args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def get_status_url(self, obj):
+        return self._url('pdf-jobs-detail', obj)
+
+    def get_download_url(self, obj):
+        if obj.status != 'concluido':
+            return None
+        return self._url('pdf-jobs-download', obj)
+
+    def validate_ids(self, value):
+        from django.conf import settings
+        limite = getattr(settings, 'PDF_BATCH_LIMIT', 100)
+        if not isinstance(value, list) or not value:
+            raise serializers.ValidationError("Informe uma lista de ids.")
+        try:
+            value = [int(i) for i in value]
+        except (TypeError, ValueError):
+            raise serializers.ValidationError("Informe uma lista de ids numéricos.")
+        if len(value) > limite:
+            raise serializers.ValidationError(f"Máximo de {limite} documentos por job.")
+        return value
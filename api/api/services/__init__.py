@@ -2,5 +2,15 @@ from .image_service import ImageService
 from .pdf_service import PDFService
 from .dashboard_service import DashboardService
 from .backup_service import BackupService
+from .pricing_service import PricingService
+from .report_service import ReportService
+from .rollup_service import RollupService
+from .export_service import ExportService
+from .report_cache import ReportCache
+from .kds_service import KDSService
+from .status_service import StatusService
+from .pdf_job_service import PDFJobService
+from .prerender_service import PreRenderService
+from .image_pipeline_service import ImagePipelineService
 
-__all__ = ['ImageService', 'PDFService', 'DashboardService', 'BackupService']
+__all__ = ['ImageService', 'PDFService', 'DashboardService', 'BackupService', 'PricingService', 'ReportService', 'RollupService', 'ExportService', 'ReportCache', 'KDSService', 'StatusService', 'PDFJobService', 'PreRenderService', 'ImagePipelineService']
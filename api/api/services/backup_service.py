@@ -292,6 +292,10 @@ class BackupService:
                             target.close()
                             source.close()
 
+            # O restore grava em modo raw (sem signals), então o resumo mensal é refeito aqui
+            from .rollup_service import RollupService
+            RollupService.rebuild()
+
             return True, "Sistema restaurado com sucesso!"
         except Exception as e:
             logger.error(f"Erro ao importar backup: {e}")
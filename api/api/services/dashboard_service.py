@@ -1,4 +1,4 @@
-from django.db.models import Count, Sum, Q, F
+from django.db.models import Count, Sum, Q
 from django.utils import timezone
 from api.models import Orcamento, PedidoFabrica, DTFVendor
 
@@ -9,47 +9,40 @@ class DashboardService:
     @staticmethod
     def get_stats():
         """Retorna estatísticas agregadas do dashboard"""
-        now = timezone.now()
-        mes_atual = now.month
-        ano_atual = now.year
+        hoje = timezone.localdate()
 
-        # Orçamentos do mês
+        # Orçamentos do mês (valor_total anotado no banco, sem iterar itens)
         orcamentos_mes = Orcamento.objects.filter(
-            data_criacao__month=mes_atual,
-            data_criacao__year=ano_atual
+            data_criacao__month=hoje.month,
+            data_criacao__year=hoje.year
+        ).com_valor_total().aggregate(
+            total=Count('id'),
+            valor=Sum('valor_total'),
         )
-        total_orcamentos_mes = orcamentos_mes.count()
-        valor_orcamentos_mes = orcamentos_mes.aggregate(
-            total=Sum('valor_total')
-        )['total'] or 0
 
-        # Pedidos de fábrica
-        pedidos_total = PedidoFabrica.objects.count()
-        pedidos_pendentes = PedidoFabrica.objects.filter(status='pendente').count()
-        pedidos_producao = PedidoFabrica.objects.filter(status='em_producao').count()
-        pedidos_finalizados = PedidoFabrica.objects.filter(status='finalizado').count()
+        # Pedidos de fábrica (uma query com contagens condicionais)
+        pedidos = PedidoFabrica.objects.aggregate(
+            total=Count('id'),
+            pendentes=Count('id', filter=Q(status='pendente')),
+            em_producao=Count('id', filter=Q(status='em_producao')),
+            finalizados=Count('id', filter=Q(status='finalizado')),
+        )
 
         # DTF Vendors
-        dtf_total = DTFVendor.objects.count()
-        dtf_pagos = DTFVendor.objects.filter(esta_pago=True).count()
-        dtf_pendentes = dtf_total - dtf_pagos
-
-        # Solicitações
+        dtf = DTFVendor.objects.aggregate(
+            total=Count('id'),
+            pagos=Count('id', filter=Q(esta_pago=True)),
+        )
 
         return {
             'orcamentos': {
-                'total_mes': total_orcamentos_mes,
-                'valor_total_mes': float(valor_orcamentos_mes),
-            },
-            'pedidos': {
-                'total': pedidos_total,
-                'pendentes': pedidos_pendentes,
-                'em_producao': pedidos_producao,
-                'finalizados': pedidos_finalizados,
+                'total_mes': orcamentos_mes['total'],
+                'valor_total_mes': float(orcamentos_mes['valor'] or 0),
             },
+            'pedidos': pedidos,
             'dtf': {
-                'total': dtf_total,
-                'pagos': dtf_pagos,
-                'pendentes': dtf_pendentes,
+                'total': dtf['total'],
+                'pagos': dtf['pagos'],
+                'pendentes': dtf['total'] - dtf['pagos'],
             },
         }
@@ -0,0 +1,79 @@
+import csv
+import json
+import tempfile
+from django.http import HttpResponse, StreamingHttpResponse, FileResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    from openpyxl import Workbook
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    Workbook = None
+    OPENPYXL_AVAILABLE = False
+
+
+class _Echo:
+    """Buffer fake para o csv.writer: devolve a linha em vez de guardar."""
+
+    def write(self, value):
+        return value
+
+
+class ExportService:
+    """Exportação de listagens em CSV/XLSX/NDJSON com memória limitada"""
+
+    FORMATOS = ('csv', 'xlsx', 'ndjson')
+    CHUNK_SIZE = 2000
+
+    @staticmethod
+    def _csv(linhas, colunas):
+        writer = csv.writer(_Echo(), delimiter=';')
+        # BOM para o Excel abrir acentos corretamente
+        yield '\ufeff' + writer.writerow(colunas)
+        for linha in linhas:
+            yield writer.writerow([linha.get(c, '') for c in colunas])
+
+    @staticmethod
+    def _ndjson(linhas):
+        for linha in linhas:
+            yield json.dumps(linha, cls=JSONEncoder, ensure_ascii=False) + '\n'
+
+    @staticmethod
+    def _xlsx(linhas, colunas):
+        # write_only grava as linhas direto em disco, sem montar a planilha em memória
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(colunas)
+        for linha in linhas:
+            ws.append([linha.get(c) for c in colunas])
+
+        arquivo = tempfile.TemporaryFile()
+        wb.save(arquivo)
+        arquivo.seek(0)
+        return arquivo
+
+    @staticmethod
+    def export(formato, queryset, serializar, colunas, filename):
+        """
+        Gera a resposta de exportação percorrendo o queryset em blocos
+        (queryset.iterator), sem carregar a listagem inteira em memória.
+        """
+        if formato == 'xlsx' and not OPENPYXL_AVAILABLE:
+            return HttpResponse('Exportação XLSX indisponível (openpyxl não instalado)', status=501)
+
+        linhas = (serializar(obj) for obj in queryset.iterator(chunk_size=ExportService.CHUNK_SIZE))
+
+        if formato == 'xlsx':
+            return FileResponse(
+                ExportService._xlsx(linhas, colunas),
+                as_attachment=True,
+                filename=f'{filename}.xlsx',
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            )
+
+        if formato == 'ndjson':
+            response = StreamingHttpResponse(ExportService._ndjson(linhas), content_type='application/x-ndjson')
+        else:
+            response = StreamingHttpResponse(ExportService._csv(linhas, colunas), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.{formato}"'
+        return response
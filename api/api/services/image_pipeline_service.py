@@ -0,0 +1,241 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from api.models import DTFVendor, PedidoFabrica
+from .image_service import ImageService, PerfilImagem
+from .pdf_service import PDFService
+from .prerender_service import PreRenderService
+
+logger = logging.getLogger(__name__)
+
+
+class ImagePipelineService:
+    """
+    Processamento das imagens enviadas fora do request: o upload é salvo
+    como veio e a resposta volta na hora; depois do commit uma thread aplica o
+    perfil do campo (PERFIS), gera o derivado de impressão e troca o arquivo no
+    registro com um UPDATE condicional (só se o campo ainda aponta para o original).
+    Os metadados do arquivo final (ImageService.metadados) vão para <campo>_meta.
+    """
+
+    # Perfis de gravação (IMAGE_PROFILES no settings sobrescreve campos de cada um)
+    PERFIS = {
+        # Arte de produção: sem perda e sem reduzir, só PNG otimizado (mesmo modo e perfil ICC)
+        'layout_dtf': PerfilImagem(max_width=None, formato='PNG', qualidade=None, modo=None),
+        # Comprovante só precisa ser legível na folha
+        'comprovante': PerfilImagem(max_width=1200, formato='JPEG', qualidade=50, modo='L'),
+        'layout_pedido': PerfilImagem(max_width=2500, formato=None, qualidade=85, modo=None),
+    }
+    # (modelo, campo): perfil e área na folha do PDF (cm)
+    CAMPOS = {
+        (DTFVendor, 'layout_arquivo'): ('layout_dtf', PDFService.AREA_DTF),
+        (DTFVendor, 'comprovante_pagamento'): ('comprovante', PDFService.AREA_DTF),
+        (PedidoFabrica, 'layout'): ('layout_pedido', PDFService.AREA_PEDIDO),
+    }
+    # Por quanto tempo um nome trocado ainda é reconhecido (instâncias antigas em memória)
+    TROCA_TTL = 24 * 3600
+
+    _executor = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def ativo():
+        return getattr(settings, 'IMAGE_PIPELINE', True)
+
+    @staticmethod
+    def perfil(nome):
+        return ImagePipelineService.PERFIS[nome]._replace(**getattr(settings, 'IMAGE_PROFILES', {}).get(nome, {}))
+
+    @staticmethod
+    def _contar(nome_perfil, antes, depois):
+        """Acumula arquivos e bytes antes/depois de cada perfil (Django cache)."""
+        for contador, valor in (('arquivos', 1), ('bytes_originais', antes), ('bytes_finais', depois)):
+            chave = f'imagem-perfil:{nome_perfil}:{contador}'
+            cache.add(chave, 0, timeout=None)
+            try:
+                cache.incr(chave, valor)
+            except ValueError:
+                cache.set(chave, valor, timeout=None)
+
+    @staticmethod
+    def stats():
+        """Economia de cada perfil desde que os contadores começaram."""
+        resultado = {}
+        for nome in ImagePipelineService.PERFIS:
+            arquivos, antes, depois = (cache.get(f'imagem-perfil:{nome}:{contador}', 0)
+                                       for contador in ('arquivos', 'bytes_originais', 'bytes_finais'))
+            resultado[nome] = {
+                **ImagePipelineService.perfil(nome)._asdict(),
+                'arquivos': arquivos,
+                'bytes_originais': antes,
+                'bytes_finais': depois,
+                'economia_bytes': antes - depois,
+                'economia_pct': round((antes - depois) / antes * 100, 1) if antes else 0,
+            }
+        return resultado
+
+    @staticmethod
+    def campos(modelo):
+        return [campo for (m, campo) in ImagePipelineService.CAMPOS if m is modelo]
+
+    @staticmethod
+    def campo_meta(campo):
+        return f'{campo}_meta'
+
+    @staticmethod
+    def _chave_troca(nome):
+        return f'imagem-pipeline:{nome}'
+
+    @staticmethod
+    def resolver(instance):
+        """
+        No pre_save: se o instance ainda aponta para um original que o pipeline
+        já trocou, usa o arquivo novo (senão o save reapontaria para um arquivo apagado).
+        """
+        for campo in ImagePipelineService.campos(type(instance)):
+            arquivo = getattr(instance, campo)
+            if arquivo and not arquivo._committed:
+                continue
+            novo = arquivo.name and cache.get(ImagePipelineService._chave_troca(arquivo.name))
+            if novo:
+                setattr(instance, campo, novo)
+
+    @staticmethod
+    def registrar_anterior(instance, old_obj):
+        """
+        Guarda no instance os arquivos antes do save. Os metadados só são
+        gravados pelo pipeline: arquivo igual ao do banco mantém os do banco,
+        arquivo novo zera até ser processado.
+        """
+        instance._imagens_anteriores = {}
+        for campo in ImagePipelineService.campos(type(instance)):
+            anterior = getattr(old_obj, campo).name
+            instance._imagens_anteriores[campo] = anterior
+            meta = ImagePipelineService.campo_meta(campo)
+            setattr(instance, meta, getattr(old_obj, meta) if getattr(instance, campo).name == anterior else {})
+
+    @classmethod
+    def _get_executor(cls):
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=max(1, getattr(settings, 'IMAGE_WORKERS', 1)),
+                    thread_name_prefix='imagem',
+                )
+            return cls._executor
+
+    @staticmethod
+    def agendar(instance):
+        """Chamado no post_save: agenda o processamento dos arquivos novos para depois do commit."""
+        anteriores = getattr(instance, '_imagens_anteriores', {})
+        for campo in ImagePipelineService.campos(type(instance)):
+            nome = getattr(instance, campo).name
+            if not nome or nome == anteriores.get(campo):
+                continue
+            tarefa = (type(instance), instance.pk, campo, nome)
+            if not ImagePipelineService.ativo():
+                # Sem pipeline: só os metadados (leitura do cabeçalho, pode ser no request)
+                transaction.on_commit(lambda t=tarefa: ImagePipelineService.registrar_meta(*t))
+                continue
+            transaction.on_commit(
+                lambda t=tarefa: ImagePipelineService._get_executor().submit(ImagePipelineService._executar, *t))
+        instance._imagens_anteriores = {
+            campo: getattr(instance, campo).name for campo in ImagePipelineService.campos(type(instance))
+        }
+
+    @staticmethod
+    def _executar(*tarefa):
+        """Roda numa thread do executor."""
+        try:
+            ImagePipelineService.processar(*tarefa)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def registrar_meta(modelo, pk, campo, nome, impressao=None):
+        """
+        Grava os metadados de `nome` no registro, se o campo ainda aponta para ele.
+        `impressao`: (limite em px, caminho do derivado de impressão ou o próprio
+        original quando ele já serve), para o PDF não precisar abrir a imagem.
+        """
+        caminho = modelo._meta.get_field(campo).storage.path(nome)
+        try:
+            meta = {'nome': nome, **ImageService.metadados(caminho)}
+        except Exception as e:
+            # Não é imagem (ex.: layout em PDF) ou sumiu
+            logger.info(f"[Imagem] Sem metadados para {nome}: {e}")
+            return None
+        if impressao:
+            limite, derivado = impressao
+            meta['impressao'] = {'limite': f'{limite[0]}x{limite[1]}', 'arquivo': os.path.basename(derivado)}
+        modelo.objects.filter(pk=pk, **{campo: nome}).update(**{ImagePipelineService.campo_meta(campo): meta})
+        return meta
+
+    @staticmethod
+    def processar(modelo, pk, campo, nome, simular=False):
+        """
+        Aplica o perfil, troca o arquivo no registro e gera o derivado de
+        impressão. Retorna (bytes antes, bytes depois) ou None.
+        `simular` só mede a economia, sem gravar nada.
+        """
+        nome_perfil, area = ImagePipelineService.CAMPOS[(modelo, campo)]
+        storage = modelo._meta.get_field(campo).storage
+        caminho = storage.path(nome)
+        try:
+            if not os.path.exists(caminho):
+                return None
+
+            antes = depois = os.path.getsize(caminho)
+            trocou = False
+            resultado = ImageService.aplicar_perfil(caminho, ImagePipelineService.perfil(nome_perfil))
+            if resultado:
+                temporario, ext = resultado
+                depois = os.path.getsize(temporario)
+                if simular:
+                    os.remove(temporario)
+                    return antes, depois
+                novo_nome = storage.get_available_name(os.path.splitext(nome)[0] + ext)
+                os.replace(temporario, storage.path(novo_nome))
+                # O mapeamento vem antes do UPDATE: um save de instance antigo nesse
+                # intervalo já grava o nome novo (senão o pre_save dele apagaria o arquivo novo)
+                chave_troca = ImagePipelineService._chave_troca(nome)
+                cache.set(chave_troca, novo_nome, ImagePipelineService.TROCA_TTL)
+                # Troca atômica: se o registro mudou (ou sumiu) nesse meio tempo, descarta
+                trocou = (modelo.objects.filter(pk=pk, **{campo: nome}).update(**{campo: novo_nome})
+                          or modelo.objects.filter(pk=pk, **{campo: novo_nome}).exists())
+                if not trocou:
+                    cache.delete(chave_troca)
+                    os.remove(storage.path(novo_nome))
+                    return None
+                # O pre_save do save antigo pode já ter apagado o original
+                if os.path.exists(caminho):
+                    os.remove(caminho)
+                ImageService.remover_derivados(caminho)
+                logger.info(f"[Imagem] {nome} -> {novo_nome} ({nome_perfil}: {antes} -> {depois} bytes)")
+                caminho, nome = storage.path(novo_nome), novo_nome
+            if simular:
+                return antes, depois
+            ImagePipelineService._contar(nome_perfil, antes, depois)
+
+            # O primeiro PDF já encontra a imagem no tamanho de impressão
+            try:
+                impressao = (ImageService.limite_impressao(*area),
+                             ImageService.gerar_derivado_impressao(caminho, *area))
+            except Exception as e:
+                logger.warning(f"[Imagem] Derivado de impressão falhou para {nome}: {e}")
+                impressao = None
+            ImagePipelineService.registrar_meta(modelo, pk, campo, nome, impressao)
+
+            if trocou:
+                # Um pré-render feito com o original ficou com a chave antiga
+                obj = modelo.objects.filter(pk=pk).first()
+                if obj is not None and PreRenderService.ativo() and PreRenderService.imprimivel(obj):
+                    PreRenderService.enfileirar((modelo, pk))
+            return antes, depois
+        except Exception as e:
+            logger.warning(f"[Imagem] Processamento de {nome} falhou: {e}")
+            return None
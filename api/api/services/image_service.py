@@ -1,35 +1,139 @@
-from PIL import Image
+from PIL import ExifTags, Image, ImageOps
+from django.conf import settings
 from django.core.files.base import ContentFile
+import glob
 import io
+import logging
+import math
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Trava de descompressão: decodificar() recusa acima disso (o Image.open do Pillow, acima do dobro)
+Image.MAX_IMAGE_PIXELS = getattr(settings, 'IMAGE_MAX_PIXELS', Image.MAX_IMAGE_PIXELS)
+
+
+# Como cada campo de imagem é gravado. max_width None mantém a resolução;
+# formato None: PNG se tiver transparência, senão JPEG; modo None: mantém o
+# modo da imagem (ou RGB(A), se o formato não o aceita e a conversão não muda a cor)
+PerfilImagem = namedtuple('PerfilImagem', ['max_width', 'formato', 'qualidade', 'modo'])
+
+
+class ImagemOcupada(Exception):
+    """Orçamento de memória de decodificação esgotado (IMAGE_DECODE_TIMEOUT)."""
+
+
+class OrcamentoMemoria:
+    """
+    Limite de memória para imagens decodificadas ao mesmo tempo no processo
+    (IMAGE_DECODE_BUDGET_MB): uploads, miniaturas e derivados simultâneos
+    esperam a vez em vez de somar picos. Uma imagem maior que o orçamento
+    inteiro é decodificada sozinha.
+    """
+
+    # RGBA decodificado + uma cópia de trabalho (convert/transpose)
+    BYTES_POR_PIXEL = 8
+
+    _cond = threading.Condition()
+    _em_uso = 0
+
+    @staticmethod
+    def limite():
+        return getattr(settings, 'IMAGE_DECODE_BUDGET_MB', 512) * 1024 * 1024
+
+    @classmethod
+    @contextmanager
+    def reservar(cls, pixels):
+        custo = min(pixels * cls.BYTES_POR_PIXEL, cls.limite())
+        with cls._cond:
+            if not cls._cond.wait_for(lambda: cls._em_uso + custo <= cls.limite(),
+                                      timeout=getattr(settings, 'IMAGE_DECODE_TIMEOUT', 60)):
+                raise ImagemOcupada("Muitas imagens sendo processadas, tente novamente em instantes")
+            cls._em_uso += custo
+        try:
+            yield
+        finally:
+            with cls._cond:
+                cls._em_uso -= custo
+                cls._cond.notify_all()
 
 
 class ImageService:
     """Serviço para processamento e otimização de imagens"""
 
+    EXTENSOES = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+    # Modos que cada formato grava sem converter
+    MODOS = {
+        'PNG': {'1', 'L', 'LA', 'I', 'I;16', 'P', 'RGB', 'RGBA'},
+        'JPEG': {'L', 'RGB', 'CMYK'},
+        'WEBP': {'RGB', 'RGBA'},
+    }
+    # Modos que viram RGB(A) sem mudar nenhuma cor (CMYK, LAB etc. mudariam)
+    CONVERSAO_EXATA = {'1', 'L', 'LA', 'P', 'PA', 'RGB', 'RGBA'}
+    # Espaço de cor de cada modo: o perfil ICC só continua válido dentro do mesmo
+    ESPACO_COR = {'1': 'cinza', 'L': 'cinza', 'LA': 'cinza', 'I': 'cinza', 'I;16': 'cinza',
+                  'P': 'rgb', 'PA': 'rgb', 'RGB': 'rgb', 'RGBA': 'rgb', 'CMYK': 'cmyk'}
+    GANHO_MINIMO = 0.05
+    # Altura "sem limite" ao reduzir só pela largura
+    SEM_LIMITE = 1 << 30
+
+    @staticmethod
+    def _girada(img):
+        """A orientação EXIF troca largura e altura (rotação de 90°)?"""
+        # No PNG o getexif() decodifica a imagem inteira atrás do eXIf; lá não tem rotação
+        return img.format != 'PNG' and img.getexif().get(ExifTags.Base.Orientation, 1) in (5, 6, 7, 8)
+
+    @staticmethod
+    @contextmanager
+    def decodificar(origem, limite=None):
+        """
+        Abre a imagem dentro do orçamento de memória do processo.
+        Com `limite` (largura, altura já orientadas) a imagem sai reduzida para
+        caber nele e com a orientação EXIF aplicada: o JPEG é decodificado já
+        reduzido (draft) e os demais via reduce() antes do LANCZOS, então só a
+        versão pequena passa por transpose/convert.
+        """
+        with Image.open(origem) as img:
+            if Image.MAX_IMAGE_PIXELS and img.width * img.height > Image.MAX_IMAGE_PIXELS:
+                raise Image.DecompressionBombError(
+                    f"Imagem com {img.width}x{img.height} px passa do IMAGE_MAX_PIXELS")
+            if limite:
+                if ImageService._girada(img):
+                    limite = limite[::-1]
+                if img.format == 'JPEG':
+                    escala = min(limite[0] / img.width, limite[1] / img.height)
+                    img.draft('RGB', (math.ceil(img.width * escala), math.ceil(img.height * escala)))
+            with OrcamentoMemoria.reservar(img.width * img.height):
+                if limite and (img.width > limite[0] or img.height > limite[1]):
+                    img.thumbnail(limite, Image.Resampling.LANCZOS, reducing_gap=2.0)
+                ImageOps.exif_transpose(img, in_place=True)
+                yield img
+
+    @staticmethod
+    def _tem_alpha(img):
+        return img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info)
+
     @staticmethod
     def convert_to_webp(imagem_input, max_width=None, quality=85):
         """
         Converte imagem para WebP, redimensiona se necessário e otimiza.
         Retorna ContentFile com a imagem processada.
         """
-        img = Image.open(imagem_input)
-
-        # Converte para RGB se necessário (WebP suporta RGBA, mas JPEG não)
-        if img.mode in ("RGBA", "P"):
-            img = img.convert("RGBA")
-        else:
-            img = img.convert("RGB")
+        limite = (max_width, ImageService.SEM_LIMITE) if max_width else None
+        with ImageService.decodificar(imagem_input, limite) as img:
+            # Converte para RGB se necessário (WebP suporta RGBA, mas JPEG não)
+            modo = "RGBA" if img.mode in ("RGBA", "P") else "RGB"
+            if img.mode != modo:
+                img = img.convert(modo)
 
-        # Redimensiona se exceder a largura máxima
-        if max_width and img.width > max_width:
-            ratio = max_width / float(img.width)
-            new_height = int(float(img.height) * float(ratio))
-            img = img.resize((max_width, new_height), Image.Resampling.LANCZOS)
-
-        # Salva como WebP
-        buffer = io.BytesIO()
-        img.save(buffer, format='WebP', quality=quality, optimize=True)
-        buffer.seek(0)
+            # Salva como WebP
+            buffer = io.BytesIO()
+            img.save(buffer, format='WebP', quality=quality, optimize=True)
+            buffer.seek(0)
 
         # Novo nome com extensão .webp
         original_name = imagem_input.name.split('.')[0]
@@ -46,15 +150,181 @@ class ImageService:
         # Remove prefixo data:image/...;base64,
         base64_string = re.sub(r'^data:image/\w+;base64,', '', base64_string)
         image_data = base64.b64decode(base64_string)
-        img = Image.open(io.BytesIO(image_data))
+        with ImageService.decodificar(io.BytesIO(image_data), max_size) as img:
+            if img.mode in ("RGBA", "P"):
+                img = img.convert("RGBA")
 
-        if img.mode in ("RGBA", "P"):
-            img = img.convert("RGBA")
+            buffer = io.BytesIO()
+            img.save(buffer, format='WebP', quality=85, optimize=True)
+            buffer.seek(0)
 
-        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        return ContentFile(buffer.read(), name="imagem_processada.webp")
 
-        buffer = io.BytesIO()
-        img.save(buffer, format='WebP', quality=85, optimize=True)
-        buffer.seek(0)
+    @staticmethod
+    def _sem_alpha(img):
+        """Achata a transparência sobre fundo branco (JPEG/RGB não têm canal alpha)."""
+        fundo = Image.new('RGB', img.size, 'white')
+        fundo.paste(img, mask=img.convert('RGBA').getchannel('A'))
+        return fundo
 
-        return ContentFile(buffer.read(), name="imagem_processada.webp")
+    @staticmethod
+    def metadados(caminho):
+        """
+        Largura/altura (já com a orientação EXIF), orientação, DPI e bytes.
+        Só lê o cabeçalho: a imagem não é decodificada.
+        """
+        with Image.open(caminho) as img:
+            largura, altura = img.size
+            if ImageService._girada(img):
+                largura, altura = altura, largura
+            dpi = img.info.get('dpi')
+        return {
+            'largura': largura,
+            'altura': altura,
+            'orientacao': 'retrato' if altura > largura else 'paisagem' if largura > altura else 'quadrada',
+            'dpi': [round(float(d)) for d in dpi] if dpi else None,
+            'bytes': os.path.getsize(caminho),
+        }
+
+    @staticmethod
+    def aplicar_perfil(caminho, perfil):
+        """
+        Versão da imagem no PerfilImagem num temporário ao lado do original:
+        orientação EXIF aplicada, reduzida a max_width, no formato/modo do perfil.
+        Sem modo no perfil, as cores não mudam: mantém o modo e o perfil ICC.
+        Retorna (temporario, ext), ou None se não ficar GANHO_MINIMO menor que o
+        original ou se o formato não guardar a imagem sem mudar as cores.
+        """
+        tamanho = os.path.getsize(caminho)
+        limite = (perfil.max_width, ImageService.SEM_LIMITE) if perfil.max_width else None
+        with ImageService.decodificar(caminho, limite) as img:
+            saida, modo_original = img, img.mode
+            tem_alpha = ImageService._tem_alpha(saida)
+            formato = perfil.formato or ('PNG' if tem_alpha else 'JPEG')
+            if tem_alpha and (formato == 'JPEG' or perfil.modo in ('RGB', 'L')):
+                saida, tem_alpha = ImageService._sem_alpha(saida), False
+            if perfil.modo:
+                modo = perfil.modo
+            elif saida.mode in ImageService.MODOS[formato]:
+                modo = saida.mode
+            elif saida.mode in ImageService.CONVERSAO_EXATA:
+                modo = 'RGBA' if tem_alpha else 'RGB'
+            else:
+                # Ex.: arte CMYK num perfil PNG: converter mudaria a cor impressa
+                return None
+            if saida.mode != modo:
+                saida = saida.convert(modo)
+
+            opcoes = {'format': formato, 'optimize': True}
+            if formato == 'JPEG':
+                opcoes.update(quality=perfil.qualidade or 85, progressive=True)
+            elif formato == 'WEBP':
+                opcoes = {'format': formato, 'method': 4}
+                opcoes.update({'quality': perfil.qualidade} if perfil.qualidade else {'lossless': True})
+            if img.info.get('dpi') and formato != 'WEBP':
+                opcoes['dpi'] = img.info['dpi']
+            icc = img.info.get('icc_profile')
+            if icc and ImageService.ESPACO_COR.get(modo) == ImageService.ESPACO_COR.get(modo_original):
+                opcoes['icc_profile'] = icc
+
+            ext = ImageService.EXTENSOES[formato]
+            fd, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix=ext)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    saida.save(f, **opcoes)
+            except BaseException:
+                os.remove(temporario)
+                raise
+
+        # Ganho pequeno não compensa (e evita re-encodar o que já está no perfil)
+        if os.path.getsize(temporario) > tamanho * (1 - ImageService.GANHO_MINIMO):
+            os.remove(temporario)
+            return None
+        return temporario, ext
+
+    @staticmethod
+    def limite_impressao(largura_cm, altura_cm, dpi=None):
+        """Tamanho máximo em pixels de uma imagem de largura_cm x altura_cm no PDF_IMAGE_DPI."""
+        dpi = dpi or getattr(settings, 'PDF_IMAGE_DPI', 200)
+        return round(largura_cm / 2.54 * dpi), round(altura_cm / 2.54 * dpi)
+
+    @staticmethod
+    def gerar_derivado_impressao(caminho, largura_cm, altura_cm, dpi=None):
+        """Como derivado_impressao, mas levanta a exceção se não conseguir gerar."""
+        dpi = dpi or getattr(settings, 'PDF_IMAGE_DPI', 200)
+        limite = ImageService.limite_impressao(largura_cm, altura_cm, dpi)
+        base = f'{os.path.splitext(caminho)[0]}.print-{limite[0]}x{limite[1]}'
+
+        original_mtime = os.stat(caminho).st_mtime
+        for ext in ('.jpg', '.png'):
+            if os.path.exists(base + ext) and os.stat(base + ext).st_mtime >= original_mtime:
+                return base + ext
+
+        with Image.open(caminho) as img:
+            # Já serve como está (pequena, sem rotação EXIF): não duplica o arquivo
+            if (img.width <= limite[0] and img.height <= limite[1] and img.format in ('JPEG', 'PNG')
+                    and img.getexif().get(ExifTags.Base.Orientation, 1) == 1):
+                return caminho
+
+        with ImageService.decodificar(caminho, limite) as img:
+            if ImageService._tem_alpha(img):
+                saida, ext = img.convert('RGBA'), '.png'
+                opcoes = {'format': 'PNG', 'optimize': True}
+            else:
+                saida, ext = img.convert('RGB'), '.jpg'
+                opcoes = {'format': 'JPEG', 'quality': 85, 'optimize': True}
+
+            # Escrita atômica: outro render pode estar lendo o mesmo derivado
+            fd, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix=ext)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    saida.save(f, dpi=(dpi, dpi), **opcoes)
+                os.replace(temporario, base + ext)
+            except BaseException:
+                os.remove(temporario)
+                raise
+            return base + ext
+
+    @staticmethod
+    def derivado_impressao(caminho, largura_cm, altura_cm, dpi=None):
+        """
+        Versão da imagem para embutir no PDF: orientação EXIF aplicada e
+        reduzida para caber em largura_cm x altura_cm no PDF_IMAGE_DPI.
+        Fica salva ao lado do original (<nome>.print-<L>x<A>.jpg/png) e só é
+        refeita quando o original muda. Retorna o caminho a usar no file://
+        (o próprio original se ele já serve ou se o derivado falhar).
+        """
+        try:
+            return ImageService.gerar_derivado_impressao(caminho, largura_cm, altura_cm, dpi)
+        except Exception as e:
+            logger.warning(f"[PDF] Derivado de impressão falhou para {caminho}: {e}")
+            return caminho
+
+    @staticmethod
+    def miniatura(caminho, tamanho, destino, qualidade=80):
+        """
+        Miniatura WebP da imagem (lado maior <= `tamanho` px, orientação EXIF
+        aplicada) gravada em `destino`. Mantém a transparência.
+        """
+        with ImageService.decodificar(caminho, (tamanho, tamanho)) as img:
+            saida = img.convert('RGBA' if ImageService._tem_alpha(img) else 'RGB')
+
+            # Escrita atômica: outra requisição pode estar servindo o mesmo arquivo
+            fd, temporario = tempfile.mkstemp(dir=os.path.dirname(destino), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    saida.save(f, format='WEBP', quality=qualidade, method=4)
+                os.replace(temporario, destino)
+            except BaseException:
+                os.remove(temporario)
+                raise
+        return destino
+
+    @staticmethod
+    def remover_derivados(caminho):
+        """Apaga os derivados de impressão de um arquivo de mídia."""
+        for derivado in glob.glob(f'{glob.escape(os.path.splitext(caminho)[0])}.print-*'):
+            try:
+                os.remove(derivado)
+            except OSError:
+                pass
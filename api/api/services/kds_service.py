@@ -0,0 +1,215 @@
+import json
+import logging
+from datetime import datetime, timedelta
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+from api.models import DTFVendor, PedidoFabrica
+
+logger = logging.getLogger(__name__)
+
+
+class KDSService:
+    """Dados do painel KDS (produção do dia) com o mínimo de queries"""
+
+    LIMITE_URGENTES = 10
+    GRUPO = 'kds'
+
+    @staticmethod
+    def janela(hoje=None):
+        """Início de hoje, início de amanhã e o corte de urgência (2 dias)."""
+        hoje = hoje or timezone.localtime().date()
+        hoje_start = timezone.make_aware(datetime.combine(hoje, datetime.min.time()))
+        return hoje_start, hoje_start + timedelta(days=1), hoje_start - timedelta(days=2)
+
+    @staticmethod
+    def bucket_dtf(item):
+        """Em qual fila do KDS um DTF pago está (None se não pago)."""
+        if not item.esta_pago:
+            return None
+        if item.foi_entregue:
+            return 'entregues'
+        if item.foi_impresso == 'impresso':
+            return 'prontos_entrega'
+        return 'fila'
+
+    @staticmethod
+    def serialize_dtf(item):
+        if item.foi_entregue:
+            status = "Finalizado"
+        elif item.foi_impresso == "impresso":
+            status = "Pronto"
+        elif item.esta_pago:
+            status = "Em Produção"
+        else:
+            status = "Orçamento"
+        return {
+            "id": item.id,
+            "cliente": item.cliente.nome,
+            "descricao": f"{item.tamanho_cm} cm",
+            "status_display": status,
+            "foi_impresso": item.foi_impresso,
+            "foi_entregue": item.foi_entregue,
+            "esta_pago": item.esta_pago,
+            "data_criacao": item.data_criacao.isoformat(),
+        }
+
+    @staticmethod
+    def serialize_urgente(obj, tipo):
+        return {
+            "id": obj.id,
+            "tipo": tipo,
+            "cliente": obj.cliente.nome if obj.cliente else "",
+            "descricao": getattr(obj, "tamanho_cm", ""),
+            "foi_impresso": getattr(obj, "foi_impresso", None),
+            "foi_entregue": getattr(obj, "foi_entregue", None),
+            "data_criacao": obj.data_criacao.isoformat(),
+        }
+
+    @staticmethod
+    def snapshot(hoje=None):
+        """
+        Estado completo do KDS.
+        Contagens em um aggregate condicional por modelo; as listas do dia
+        saem de uma única leitura separada em filas no Python.
+        """
+        hoje_start, amanha_start, dois_dias_atras = KDSService.janela(hoje)
+        do_dia = Q(data_criacao__gte=hoje_start, data_criacao__lt=amanha_start)
+
+        # ===========================
+        # DTF
+        # ===========================
+        pago = Q(esta_pago=True)
+        dtf = DTFVendor.objects.filter(do_dia).aggregate(
+            total=Count('id'),
+            pagos=Count('id', filter=pago),
+            fila=Count('id', filter=pago & Q(foi_impresso='pendente', foi_entregue=False)),
+            prontos_entrega=Count('id', filter=pago & Q(foi_impresso='impresso', foi_entregue=False)),
+            entregues=Count('id', filter=pago & Q(foi_entregue=True)),
+        )
+
+        # Pagos e não entregues de hoje (fila + prontos) numa leitura só
+        listas = {'fila': [], 'prontos_entrega': []}
+        ativos = DTFVendor.objects.filter(
+            do_dia, esta_pago=True, foi_entregue=False
+        ).select_related("cliente").order_by("data_criacao")
+        for item in ativos:
+            bucket = KDSService.bucket_dtf(item)
+            if bucket in listas:
+                listas[bucket].append(KDSService.serialize_dtf(item))
+
+        # Urgentes = pagos há mais de 2 dias e ainda não entregues
+        dtf_urgentes = DTFVendor.objects.filter(
+            esta_pago=True,
+            foi_entregue=False,
+            data_criacao__lt=dois_dias_atras
+        ).select_related("cliente").order_by("data_criacao")[:KDSService.LIMITE_URGENTES]
+
+        # ===========================
+        # PEDIDO FABRICA
+        # ===========================
+        pf = PedidoFabrica.objects.filter(do_dia).aggregate(
+            total=Count('id'),
+            pendente=Count('id', filter=Q(status='pendente')),
+            em_producao=Count('id', filter=Q(status='em_producao')),
+            finalizado=Count('id', filter=Q(status='finalizado')),
+        )
+
+        pf_urgentes = PedidoFabrica.objects.filter(
+            status="pendente",
+            data_criacao__lt=dois_dias_atras
+        ).select_related("cliente").order_by("data_criacao")[:KDSService.LIMITE_URGENTES]
+
+        return {
+            "dtf": {
+                "total": dtf['total'],
+                "pagos": dtf['pagos'],
+                "fila": dtf['fila'],
+                "fila_list": listas['fila'],
+                "prontos_entrega": dtf['prontos_entrega'],
+                "prontos_entrega_list": listas['prontos_entrega'],
+                "entregues": dtf['entregues'],
+                "urgentes": [KDSService.serialize_urgente(i, "DTF") for i in dtf_urgentes],
+            },
+            "pedido_fabrica": {
+                **pf,
+                "urgentes": [KDSService.serialize_urgente(i, "FABRICA") for i in pf_urgentes],
+            },
+        }
+
+    # ===========================
+    # Deltas em tempo real (ws/kds/)
+    # ===========================
+
+    @staticmethod
+    def estado(obj):
+        """Onde o registro aparece no painel: do dia, fila/status e se é urgente."""
+        if obj.data_criacao is None:
+            return None
+        hoje_start, amanha_start, dois_dias_atras = KDSService.janela()
+        estado = {'hoje': hoje_start <= obj.data_criacao < amanha_start}
+        if isinstance(obj, PedidoFabrica):
+            estado['bucket'] = obj.status
+            estado['urgente'] = obj.status == 'pendente' and obj.data_criacao < dois_dias_atras
+        else:
+            estado['bucket'] = KDSService.bucket_dtf(obj)
+            estado['urgente'] = (
+                obj.esta_pago and not obj.foi_entregue and obj.data_criacao < dois_dias_atras
+            )
+        return estado
+
+    @staticmethod
+    def registrar_anterior(instance, old_obj):
+        """Guarda no instance o estado do KDS antes do save."""
+        instance._kds_anterior = KDSService.estado(old_obj)
+
+    @staticmethod
+    def evento(instance, antes, depois):
+        """
+        Delta enviado aos painéis, ou None se o registro não mudou de fila/status
+        (nem entrou/saiu do dia ou dos urgentes).
+        """
+        if antes == depois:
+            return None
+
+        is_dtf = isinstance(instance, DTFVendor)
+        evento = {
+            'modelo': 'dtf' if is_dtf else 'pedido_fabrica',
+            'id': instance.id,
+            'antes': antes,
+            'depois': depois,
+        }
+        if depois and is_dtf and depois['hoje'] and depois['bucket'] in ('fila', 'prontos_entrega'):
+            evento['item'] = KDSService.serialize_dtf(instance)
+        if depois and depois['urgente']:
+            evento['urgente'] = KDSService.serialize_urgente(instance, 'DTF' if is_dtf else 'FABRICA')
+        return evento
+
+    @staticmethod
+    def notificar(instance, removido=False):
+        """Publica o delta do save/delete no grupo do KDS depois do commit."""
+        antes = getattr(instance, '_kds_anterior', None)
+        depois = None if removido else KDSService.estado(instance)
+        instance._kds_anterior = depois
+        try:
+            evento = KDSService.evento(instance, antes, depois)
+        except Exception as e:
+            logger.error(f"[KDS] Erro ao montar delta: {e}")
+            return
+        if evento:
+            transaction.on_commit(lambda: KDSService.enviar(evento))
+
+    @staticmethod
+    def enviar(evento):
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        try:
+            # Decimal/datetime -> tipos simples (o channel layer precisa serializar a mensagem)
+            evento = json.loads(json.dumps(evento, cls=JSONEncoder))
+            async_to_sync(channel_layer.group_send)(KDSService.GRUPO, {'type': 'kds_delta', **evento})
+        except Exception as e:
+            logger.error(f"[KDS] Erro ao enviar delta via WebSocket: {e}")
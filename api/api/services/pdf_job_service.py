@@ -0,0 +1,148 @@
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from api.models import Orcamento, DTFVendor, PedidoFabrica, PDFJob
+from api.tools.utils import preparar_pdf, obter_pdf
+from .pdf_service import PDFService
+
+logger = logging.getLogger(__name__)
+
+
+class PDFJobService:
+    """Jobs de PDF em segundo plano: cria, executa, acompanha progresso e limpa expirados"""
+
+    _executor = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def documentos(tipo):
+        """(queryset, montador de DocumentoPDF) de cada tipo de job."""
+        return {
+            'orcamento': (
+                Orcamento.objects.com_valor_total()
+                .select_related('empresa', 'cliente').prefetch_related('itens__produto'),
+                PDFService.documento_orcamento,
+            ),
+            'dtf': (DTFVendor.objects.select_related('cliente'), PDFService.documento_dtf),
+            'pedido': (PedidoFabrica.objects.select_related('cliente'), PDFService.documento_pedido),
+        }[tipo]
+
+    @staticmethod
+    def diretorio():
+        return getattr(settings, 'PDF_JOBS_DIR', os.path.join(settings.BASE_DIR, 'cache', 'pdf_jobs'))
+
+    @staticmethod
+    def ttl():
+        return timedelta(seconds=getattr(settings, 'PDF_JOB_TTL', 3600))
+
+    @staticmethod
+    def timeout():
+        return getattr(settings, 'PDF_JOB_TIMEOUT', 600)
+
+    @classmethod
+    def _get_executor(cls):
+        with cls._lock:
+            if cls._executor is None:
+                # As threads só montam o HTML e esperam o pool de processos
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=max(1, getattr(settings, 'PDF_WORKERS', 2)),
+                    thread_name_prefix='pdf-job',
+                )
+            return cls._executor
+
+    @staticmethod
+    def criar(usuario, tipo, ids, nome_arquivo=None):
+        """Registra o job e agenda a execução para depois do commit."""
+        PDFJobService.limpar_expirados()
+        if not nome_arquivo:
+            nome_arquivo = f'{tipo}-{ids[0]}.pdf' if len(ids) == 1 else \
+                f'{tipo}-lote-{timezone.localdate():%Y-%m-%d}.pdf'
+        job = PDFJob.objects.create(
+            usuario=usuario if usuario and usuario.is_authenticated else None,
+            tipo=tipo,
+            ids=list(ids),
+            nome_arquivo=nome_arquivo,
+            # Se o servidor reiniciar no meio, o job órfão também expira
+            expira_em=timezone.now() + PDFJobService.ttl() + timedelta(seconds=PDFJobService.timeout()),
+        )
+        transaction.on_commit(lambda: PDFJobService._get_executor().submit(PDFJobService.executar, job.pk))
+        return job
+
+    @staticmethod
+    def _atualizar(job_id, **campos):
+        PDFJob.objects.filter(pk=job_id).update(**campos)
+
+    @staticmethod
+    def executar(job_id):
+        """Roda numa thread do executor: monta os documentos, renderiza e grava o arquivo."""
+        try:
+            job = PDFJob.objects.get(pk=job_id)
+            PDFJobService._atualizar(job_id, status='processando', progresso=1)
+
+            queryset, montar = PDFJobService.documentos(job.tipo)
+            objetos = queryset.in_bulk(job.ids)
+            faltando = [i for i in job.ids if i not in objetos]
+            if faltando:
+                raise ValueError(f'Documentos não encontrados: {faltando}')
+            documentos = [montar(objetos[i]) for i in job.ids]
+
+            # Templates = até 80%; o resto é o WeasyPrint
+            ultimo = [0]
+
+            def progresso(feitos, total):
+                valor = 1 + int(79 * feitos / total)
+                if valor - ultimo[0] >= 5 or feitos == total:
+                    ultimo[0] = valor
+                    PDFJobService._atualizar(job_id, progresso=valor)
+
+            chave, gerar = preparar_pdf(documentos, progresso)
+            os.makedirs(PDFJobService.diretorio(), exist_ok=True)
+            destino = os.path.join(PDFJobService.diretorio(), f'{job_id}.pdf')
+            # Cópia: o cache pode descartar o original antes do download
+            fd, temporario = tempfile.mkstemp(dir=PDFJobService.diretorio(), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as saida, obter_pdf(
+                        chave, lambda d: gerar(d, timeout=PDFJobService.timeout(), esperar_vaga=True)) as pdf:
+                    shutil.copyfileobj(pdf, saida)
+                os.replace(temporario, destino)
+            except BaseException:
+                try:
+                    os.remove(temporario)
+                except OSError:
+                    pass
+                raise
+
+            agora = timezone.now()
+            PDFJobService._atualizar(
+                job_id, status='concluido', progresso=100, arquivo=destino,
+                nome_arquivo=documentos[0].filename if len(documentos) == 1 else job.nome_arquivo,
+                concluido_em=agora, expira_em=agora + PDFJobService.ttl(),
+            )
+        except Exception as e:
+            logger.error(f"[PDF job] {job_id} falhou: {e}")
+            agora = timezone.now()
+            PDFJobService._atualizar(
+                job_id, status='erro', erro=str(e), concluido_em=agora,
+                expira_em=agora + PDFJobService.ttl(),
+            )
+        finally:
+            connection.close()
+
+    @staticmethod
+    def limpar_expirados():
+        """Apaga jobs (e arquivos) que passaram do PDF_JOB_TTL."""
+        expirados = PDFJob.objects.filter(expira_em__lt=timezone.now())
+        for arquivo in expirados.exclude(arquivo='').values_list('arquivo', flat=True):
+            try:
+                os.remove(arquivo)
+            except OSError:
+                pass
+        removidos, _ = expirados.delete()
+        return removidos
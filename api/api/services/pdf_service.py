@@ -1,58 +1,160 @@
-from django.http import HttpResponse
-from django.template.loader import render_to_string
-from io import BytesIO
+import os
+from collections import namedtuple
+from django.conf import settings
+from django.utils import timezone
+from num2words import num2words
+from .image_service import ImageService
 
-try:
-    from weasyprint import HTML
-    WEASYPRINT_AVAILABLE = True
-except OSError:
-    HTML = None
-    WEASYPRINT_AVAILABLE = False
+# template: caminho em templates/; volateis: chaves do context fora da chave do cache
+DocumentoPDF = namedtuple('DocumentoPDF', ['template', 'context', 'filename', 'volateis'])
 
 
 class PDFService:
-    """Serviço centralizado para geração de PDFs"""
+    """Montagem dos documentos (template + context) dos PDFs de orçamento, DTF e pedido"""
+
+    ORDEM_TAMANHOS = ["pp", "p", "m", "g", "gg", "xgg", "xxgg"]
+    ORDEM_BL = ["bl pp", "bl p", "bl m", "bl g", "bl gg", "bl xgg", "bl xxgg"]
+    # Área de cada imagem na folha (cm): DTF tem layout e comprovante lado a lado
+    AREA_DTF = (9.5, 11.5)
+    AREA_PEDIDO = (29.0, 12.0)
+
+    @staticmethod
+    def documento_orcamento(orcamento):
+        """Orçamento no template da empresa (pdfs/<template_id>.html)."""
+        # Adicionando o valor por extenso
+        valor_extenso = num2words(
+            orcamento.valor_total, lang='pt_BR', to='currency')
+        logo_path = os.path.join(
+            settings.BASE_DIR, 'static', 'logo-yasprint.png')
+        context = {
+            'orcamento': orcamento,
+            'itens': orcamento.itens.all(),
+            'valor_extenso': valor_extenso,
+            'logo_url': f'file://{logo_path}'
+        }
+
+        tid = orcamento.empresa.template_id
+        name = f'{orcamento.empresa.nome}-{orcamento.cliente.nome}-{orcamento.id}'
+        return DocumentoPDF(f'pdfs/{tid}.html', context, f'{name}.pdf', ())
+
+    @staticmethod
+    def _derivado_registrado(original, area, meta):
+        """Derivado de impressão anotado no meta, se ainda vale para a `area` e o original."""
+        impressao = (meta or {}).get('impressao')
+        limite = ImageService.limite_impressao(*area)
+        if not impressao or impressao.get('limite') != f'{limite[0]}x{limite[1]}':
+            return None
+        path = os.path.join(os.path.dirname(original), impressao['arquivo'])
+        if path == original:
+            return path
+        try:
+            # Apagado ou mais antigo que o original: refaz pelo caminho normal
+            return path if os.stat(path).st_mtime >= os.stat(original).st_mtime else None
+        except OSError:
+            return None
 
     @staticmethod
-    def generate_orcamento_pdf(orcamento):
-        """Gera PDF de orçamento usando WeasyPrint"""
-        if not WEASYPRINT_AVAILABLE:
-            raise RuntimeError('PDF generation unavailable on this system (GTK3 required).')
-
-        html_string = render_to_string('pdfs/pedido.html', {'pedido': orcamento})
-        html = HTML(string=html_string, base_url='http://localhost:8000')
-        pdf_file = BytesIO()
-        html.write_pdf(pdf_file)
-        pdf_file.seek(0)
-        return pdf_file
+    def obter_dados_imagem(campo_arquivo, area, meta=None):
+        """
+        URL file:// do derivado de impressão da imagem e se ela é retrato.
+        O derivado já vem reduzido para a `area` (cm) e com a orientação EXIF aplicada.
+        `meta` (<campo>_meta do registro) evita abrir a imagem: traz a orientação
+        e o derivado gravado pelo pipeline.
+        """
+        if not campo_arquivo or not hasattr(campo_arquivo, 'path') or not os.path.exists(campo_arquivo.path):
+            return None, False
+
+        try:
+            if not meta or meta.get('nome') != campo_arquivo.name:
+                # Upload ainda não passou pelo pipeline (ou registro anterior aos metadados)
+                meta = None
+            path = PDFService._derivado_registrado(campo_arquivo.path, area, meta)
+            if path is None:
+                path = ImageService.derivado_impressao(campo_arquivo.path, *area)
+            if meta is None:
+                meta = ImageService.metadados(path)
+            # Apenas detecta se precisa girar (altura > largura)
+            return 'file://' + path.replace('\\', '/'), meta['altura'] > meta['largura']
+        except Exception:
+            return None, False
 
     @staticmethod
-    def generate_pedido_pdf(pedido):
-        """Gera PDF de pedido de fábrica"""
-        if not WEASYPRINT_AVAILABLE:
-            raise RuntimeError('PDF generation unavailable on this system (GTK3 required).')
-
-        # Determina qual template usar baseado na empresa
-        template_id = pedido.cliente.empresa.template_id if hasattr(pedido.cliente, 'empresa') else 1
-        template_map = {1: 'pdfs/1.html', 2: 'pdfs/2.html', 3: 'pdfs/3.html'}
-        template = template_map.get(template_id, 'pdfs/pedido.html')
-
-        html_string = render_to_string(template, {'pedido': pedido})
-        html = HTML(string=html_string, base_url='http://localhost:8000')
-        pdf_file = BytesIO()
-        html.write_pdf(pdf_file)
-        pdf_file.seek(0)
-        return pdf_file
+    def documento_dtf(dtf):
+        """Folha de produção de um DTF (pdfs/dtf_pedido.html)."""
+        layout_url, girar_layout = PDFService.obter_dados_imagem(
+            dtf.layout_arquivo, PDFService.AREA_DTF, dtf.layout_arquivo_meta)
+        comp_url, girar_comp = PDFService.obter_dados_imagem(
+            dtf.comprovante_pagamento, PDFService.AREA_DTF, dtf.comprovante_pagamento_meta)
+
+        context = {
+            'dtf': dtf,
+            'layout_path': layout_url,
+            'rotate_layout': girar_layout,
+            'comprovante_path': comp_url,
+            'rotate_comprovante': girar_comp,
+        }
+
+        name = f'dtf-{dtf.cliente.nome}-{dtf.id}'
+        return DocumentoPDF('pdfs/dtf_pedido.html', context, f'{name}.pdf', ())
 
     @staticmethod
-    def generate_dtf_pdf(vendor):
-        """Gera PDF de venda DTF"""
-        if not WEASYPRINT_AVAILABLE:
-            raise RuntimeError('PDF generation unavailable on this system (GTK3 required).')
-
-        html_string = render_to_string('pdfs/dtf_pedido.html', {'vendor': vendor})
-        html = HTML(string=html_string, base_url='http://localhost:8000')
-        pdf_file = BytesIO()
-        html.write_pdf(pdf_file)
-        pdf_file.seek(0)
-        return pdf_file
+    def grades(detalhes_tamanho):
+        """Separa a grade do pedido em adulto, baby look, infantil e outros."""
+        ordem_tamanhos = PDFService.ORDEM_TAMANHOS
+        ordem_bl = PDFService.ORDEM_BL
+        detalhes = {k.lower(): v for k, v in detalhes_tamanho.items()}
+
+        grade_adulto = [
+            {"tamanho": t, "qtd": detalhes[t]}
+            for t in ordem_tamanhos
+            if detalhes.get(t, 0) > 0
+        ]
+
+        grade_bl = [
+            {"tamanho": t, "qtd": detalhes[t]}
+            for t in ordem_bl
+            if detalhes.get(t, 0) > 0
+        ]
+
+        grade_inf = [
+            {"tamanho": t, "qtd": q}
+            for t, q in detalhes.items()
+            if q > 0 and ("a" in t or "anos" in t)
+        ]
+
+        grade_outros = [
+            {"tamanho": t, "qtd": q}
+            for t, q in detalhes.items()
+            if q > 0
+            and t not in ordem_tamanhos
+            and t not in ordem_bl
+            and not ("a" in t or "anos" in t)
+        ]
+
+        return {
+            'grade_adulto': grade_adulto,
+            'grade_bl': grade_bl,
+            'grade_inf': grade_inf,
+            'grade_outros': grade_outros,
+        }
+
+    @staticmethod
+    def documento_pedido(pedido):
+        """Ficha do pedido de fábrica (pdfs/pedido.html)."""
+        logo_path = os.path.join(
+            settings.BASE_DIR, 'static', 'logo-printcollor.png')
+
+        layout_url, _ = PDFService.obter_dados_imagem(pedido.layout, PDFService.AREA_PEDIDO, pedido.layout_meta)
+
+        context = {
+            'pedido': pedido,
+            'logo_url': f'file://{logo_path}',
+            'layout_url': layout_url,
+            'total': pedido.total_itens(),
+            **PDFService.grades(pedido.detalhes_tamanho),
+            'now': timezone.now(),
+        }
+
+        name = f'pedido-{pedido.cliente.nome}-{pedido.id}'
+        # "Gerado em" não invalida o cache
+        return DocumentoPDF('pdfs/pedido.html', context, f'{name}.pdf', ('now',))
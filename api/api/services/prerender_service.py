@@ -0,0 +1,104 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection, transaction
+from api.models import DTFVendor, PedidoFabrica
+from api.tools.utils import preparar_pdf, obter_pdf
+from api.tools.pdf_cache import PDFCache
+from api.tools.pdf_pool import PDFPool, PDFOcupado
+from .pdf_service import PDFService
+
+logger = logging.getLogger(__name__)
+
+
+class PreRenderService:
+    """
+    Pré-render especulativo: quando um DTF fica pago (status 'aprovado') ou um
+    pedido entra em produção, o PDF é gerado em segundo plano e fica no cache,
+    e o clique do operador já encontra o arquivo pronto.
+    Nunca disputa com requisições interativas: no máximo PDF_PRERENDER_MAX
+    renders por vez, só com worker livre no pool, e o que não couber é descartado.
+    """
+
+    # Limite de pré-renders aguardando; acima disso, descarta
+    FILA = 20
+
+    _executor = None
+    _pendentes = set()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def ativo():
+        return (getattr(settings, 'PDF_PRERENDER', True) and PDFCache.ativo()
+                and PDFPool.config()['workers'] > 0)
+
+    @staticmethod
+    def imprimivel(obj):
+        """O operador vai pedir a folha: DTF pago aguardando impressão / pedido em produção."""
+        if isinstance(obj, DTFVendor):
+            return obj.status == 'aprovado'
+        return obj.status == 'em_producao'
+
+    @staticmethod
+    def registrar_anterior(instance, old_obj):
+        """Guarda no instance se ele já estava imprimível antes do save."""
+        instance._prerender_anterior = PreRenderService.imprimivel(old_obj)
+
+    @classmethod
+    def _get_executor(cls):
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=max(1, getattr(settings, 'PDF_PRERENDER_MAX', 1)),
+                    thread_name_prefix='pdf-prerender',
+                )
+            return cls._executor
+
+    @staticmethod
+    def agendar(instance):
+        """Chamado no post_save: agenda o pré-render (após o commit) se o registro acabou de ficar imprimível."""
+        if not PreRenderService.ativo():
+            return
+        if getattr(instance, '_prerender_anterior', False) or not PreRenderService.imprimivel(instance):
+            return
+        instance._prerender_anterior = True
+        chave = (type(instance), instance.pk)
+        transaction.on_commit(lambda: PreRenderService.enfileirar(chave))
+
+    @classmethod
+    def enfileirar(cls, chave):
+        """Coloca (modelo, pk) na fila de pré-render, sem duplicar."""
+        with cls._lock:
+            if chave in cls._pendentes or len(cls._pendentes) >= cls.FILA:
+                return
+            cls._pendentes.add(chave)
+        cls._get_executor().submit(cls.executar, *chave)
+
+    @classmethod
+    def executar(cls, modelo, pk):
+        """Roda numa thread do executor: monta o documento e grava no cache do PDF."""
+        try:
+            if modelo is DTFVendor:
+                obj = DTFVendor.objects.select_related('cliente').filter(pk=pk).first()
+                montar = PDFService.documento_dtf
+            else:
+                obj = PedidoFabrica.objects.select_related('cliente').filter(pk=pk).first()
+                montar = PDFService.documento_pedido
+            # Pode ter mudado (ou sido apagado) entre o save e agora
+            if obj is None or not cls.imprimivel(obj):
+                return
+
+            chave, gerar = preparar_pdf([montar(obj)])
+            if PDFCache.get(chave) is not None:
+                return
+            obter_pdf(chave, lambda destino: gerar(destino, especulativo=True)).close()
+            logger.info(f"[PDF pré-render] {modelo.__name__} {pk} no cache")
+        except PDFOcupado:
+            logger.info(f"[PDF pré-render] {modelo.__name__} {pk} descartado: pool ocupado")
+        except Exception as e:
+            logger.warning(f"[PDF pré-render] {modelo.__name__} {pk} falhou: {e}")
+        finally:
+            with cls._lock:
+                cls._pendentes.discard((modelo, pk))
+            connection.close()
@@ -0,0 +1,123 @@
+import threading
+import time
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import (
+    Case, When, Value, F, OuterRef, Subquery, DecimalField, IntegerField,
+)
+from django.db.models.functions import Coalesce, Greatest, NullIf
+from api.models import DTFConfig
+
+MONEY = DecimalField(max_digits=14, decimal_places=4)
+
+# Usado quando não existe DTFConfig para o tipo
+PRECOS_PADRAO = {
+    'valor_metro': Decimal('35.00'),
+    'preco_minimo': Decimal('20.00'),
+    'valor_unidade': Decimal('0.00'),
+}
+
+CHAVE_VERSAO = 'dtfconfig:versao'
+
+
+class PricingService:
+    """Regras de preço do DTFVendor: tabela em memória e expressões do banco"""
+
+    # Tabela de preços por processo: {tipo_produto: {valor_metro, preco_minimo, valor_unidade}}
+    _tabela = None
+    _versao = None
+    _verificado_em = 0.0
+    _lock = threading.Lock()
+
+    @classmethod
+    def tabela(cls):
+        """
+        Tabela de preços do DTFConfig carregada uma vez por processo.
+        A cada PRICING_CACHE_CHECK_INTERVAL segundos confere a versão no cache
+        compartilhado e recarrega se outro worker alterou algum DTFConfig.
+        """
+        agora = time.monotonic()
+        intervalo = getattr(settings, 'PRICING_CACHE_CHECK_INTERVAL', 5)
+        if cls._tabela is not None and agora - cls._verificado_em < intervalo:
+            return cls._tabela
+
+        with cls._lock:
+            cache.add(CHAVE_VERSAO, 1, timeout=None)
+            versao = cache.get(CHAVE_VERSAO, 1)
+            if cls._tabela is None or versao != cls._versao:
+                cls._tabela = {
+                    config['tipo_produto']: config
+                    for config in DTFConfig.objects.values(
+                        'tipo_produto', 'valor_metro', 'preco_minimo', 'valor_unidade')
+                }
+                cls._versao = versao
+            cls._verificado_em = agora
+        return cls._tabela
+
+    @classmethod
+    def precos(cls, tipo_produto):
+        """Preços de um tipo_produto (ou os padrões se não houver config)."""
+        return cls.tabela().get(tipo_produto, PRECOS_PADRAO)
+
+    @classmethod
+    def invalidar(cls):
+        """Descarta a tabela local e avisa os outros workers (versão no cache)."""
+        cache.add(CHAVE_VERSAO, 1, timeout=None)
+        try:
+            cache.incr(CHAVE_VERSAO)
+        except ValueError:
+            cache.set(CHAVE_VERSAO, 2, timeout=None)
+        with cls._lock:
+            cls._tabela = None
+
+    @staticmethod
+    def _config(campo, padrao):
+        """Valor do DTFConfig do mesmo tipo_produto (subquery), com fallback."""
+        subquery = Subquery(
+            DTFConfig.objects.filter(
+                tipo_produto=OuterRef('tipo_produto')
+            ).values(campo)[:1],
+            output_field=MONEY,
+        )
+        return Coalesce(subquery, Value(padrao), output_field=MONEY)
+
+    @staticmethod
+    def quantidade_expression():
+        """Equivalente a `quantidade or 1`."""
+        return Coalesce(
+            NullIf(F('quantidade'), Value(0)), Value(1),
+            output_field=IntegerField(),
+        )
+
+    @staticmethod
+    def valor_total_expression():
+        """
+        Mesmo cálculo de DTFVendor.calcular_valor_total(), feito no banco:
+        - estampa: override (ou valor_unidade da config) * quantidade
+        - m2 (sublimação): tamanho_cm / 10000 * preço
+        - ml (DTF têxtil/UV): tamanho_cm / 100 * preço
+        - respeitando o preco_minimo da config (exceto estampa)
+        Usa multiplicação em vez de divisão para não cair em divisão inteira no SQLite.
+        """
+        valor_metro = PricingService._config('valor_metro', PRECOS_PADRAO['valor_metro'])
+        preco_minimo = PricingService._config('preco_minimo', PRECOS_PADRAO['preco_minimo'])
+        valor_unidade = PricingService._config('valor_unidade', PRECOS_PADRAO['valor_unidade'])
+        quantidade = PricingService.quantidade_expression()
+
+        preco = Coalesce(F('preco_unit_override'), valor_metro, output_field=MONEY)
+        total_medida = Case(
+            When(unidade='m2', then=F('tamanho_cm') * Value(Decimal('0.0001')) * preco),
+            default=F('tamanho_cm') * Value(Decimal('0.01')) * preco,
+            output_field=MONEY,
+        )
+
+        return Case(
+            When(
+                tipo_produto='estampa', preco_unit_override__isnull=False,
+                then=F('preco_unit_override') * quantidade,
+            ),
+            When(tipo_produto='estampa', then=valor_unidade * quantidade),
+            default=Greatest(total_medida, preco_minimo, output_field=MONEY),
+            output_field=MONEY,
+        )
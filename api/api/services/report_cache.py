@@ -0,0 +1,103 @@
+import logging
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PREFIXO = 'relatorios'
+
+
+class ReportCache:
+    """
+    Cache dos relatórios (Django cache framework) com invalidação por versão.
+
+    A chave de cada resposta inclui um contador global e um contador por ano.
+    Qualquer escrita em DTFVendor/PedidoFabrica/Orcamento incrementa o contador
+    do ano afetado; rebuild do resumo/reprecificação incrementa o do ano (ou o
+    global, quando não é limitado a um ano). Anos já fechados
+    expiram em REPORT_CACHE_TIMEOUT_FECHADO, o ano corrente em REPORT_CACHE_TIMEOUT.
+    Respostas com totais de todos os anos (dashboard) usam `totais=True`: a
+    chave inclui também um contador incrementado em qualquer escrita.
+    """
+
+    @staticmethod
+    def _versao_inicial():
+        # Contador descartado pelo backend recomeça de um valor novo, nunca de 1:
+        # respostas gravadas com a versão antiga não voltam a ser servidas
+        return time.time_ns()
+
+    @staticmethod
+    def _versao(chave):
+        cache.add(chave, ReportCache._versao_inicial(), timeout=None)
+        versao = cache.get(chave)
+        return versao if versao is not None else ReportCache._versao_inicial()
+
+    @staticmethod
+    def _incrementar(chave, inicial=0):
+        # add só grava se a chave não existir; o incr é atômico nos backends que suportam
+        cache.add(chave, inicial, timeout=None)
+        try:
+            return cache.incr(chave)
+        except ValueError:
+            # A chave expirou/foi removida entre o add e o incr
+            cache.set(chave, inicial + 1, timeout=None)
+            return inicial + 1
+
+    @staticmethod
+    def chave(endpoint, ano, totais=False, **params):
+        versao_global = ReportCache._versao(f'{PREFIXO}:versao')
+        versao_ano = ReportCache._versao(f'{PREFIXO}:versao:{ano}')
+        extras = ':'.join(f'{k}={params[k]}' for k in sorted(params))
+        chave = f'{PREFIXO}:{endpoint}:{ano}:{extras}:v{versao_global}.{versao_ano}'
+        if totais:
+            chave += f'.{ReportCache._versao(f"{PREFIXO}:versao:totais")}'
+        return chave
+
+    @staticmethod
+    def get_or_build(endpoint, ano, builder, totais=False, **params):
+        """Retorna a resposta em cache ou chama builder() e guarda o resultado."""
+        chave = ReportCache.chave(endpoint, ano, totais, **params)
+        dados = cache.get(chave)
+        if dados is not None:
+            ReportCache._incrementar(f'{PREFIXO}:hits')
+            return dados
+
+        ReportCache._incrementar(f'{PREFIXO}:misses')
+        dados = builder()
+        fechado = ano < timezone.localdate().year
+        if fechado:
+            timeout = getattr(settings, 'REPORT_CACHE_TIMEOUT_FECHADO', 86400)
+        else:
+            timeout = getattr(settings, 'REPORT_CACHE_TIMEOUT', 300)
+        cache.set(chave, dados, timeout=timeout)
+        return dados
+
+    @staticmethod
+    def invalidar(ano=None):
+        """Invalida os relatórios de um ano, ou de todos os anos se ano=None."""
+        if ano is None:
+            ReportCache._incrementar(f'{PREFIXO}:versao', inicial=ReportCache._versao_inicial())
+        else:
+            ReportCache._incrementar(f'{PREFIXO}:versao:{ano}', inicial=ReportCache._versao_inicial())
+
+    @staticmethod
+    def invalidar_por_data(data):
+        """Escrita num registro: invalida o ano dele e os totais de todos os anos."""
+        ReportCache._incrementar(f'{PREFIXO}:versao:totais', inicial=ReportCache._versao_inicial())
+        if data is None:
+            ReportCache.invalidar(timezone.localdate().year)
+        else:
+            ReportCache.invalidar(timezone.localtime(data).year)
+
+    @staticmethod
+    def stats():
+        hits = cache.get(f'{PREFIXO}:hits', 0)
+        misses = cache.get(f'{PREFIXO}:misses', 0)
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else 0,
+        }
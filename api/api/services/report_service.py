@@ -0,0 +1,165 @@
+from datetime import date
+from decimal import Decimal
+from django.db.models import Count, F, Sum, Q
+from api.models import DTFVendor, ResumoMensal
+from .pricing_service import PricingService
+
+
+class ReportService:
+    """Relatórios agregados a partir do ResumoMensal"""
+
+    @staticmethod
+    def _linha_tipo(tipo_val, tipo_label, agg):
+        """Monta a linha de um tipo de produto com a unidade correta."""
+        if tipo_val == 'estampa':
+            # Estampa: quantidade de unidades
+            quantidade = round(agg['unidades'], 2)
+            unidade = 'un'
+        elif tipo_val == 'sublimacao':
+            # Sublimação: tamanho_cm = cm² → m²
+            quantidade = round(float(agg['metros_quadrados']), 2)
+            unidade = 'm²'
+        else:
+            # DTF Têxtil/UV: tamanho_cm = cm lineares → metros
+            quantidade = round(float(agg['metros_lineares']), 2)
+            unidade = 'm'
+        return {
+            'tipo': tipo_val,
+            'tipo_display': tipo_label,
+            'total_pedidos': agg['total_pedidos'],
+            'total_revenue': float(agg['total_revenue']),
+            'quantidade': quantidade,
+            'unidade': unidade,
+        }
+
+    @staticmethod
+    def _somar(destino, resumo):
+        """Acumula uma linha do ResumoMensal (pago ou não) em um dict de totais."""
+        for chave, campo in (('total_pedidos', 'total_pedidos'), ('total_revenue', 'valor_total'),
+                             ('metros_lineares', 'metros_lineares'),
+                             ('metros_quadrados', 'metros_quadrados'), ('unidades', 'unidades')):
+            destino[chave] = destino.get(chave, 0) + getattr(resumo, campo)
+        if resumo.esta_pago:
+            destino['pagos_pedidos'] = destino.get('pagos_pedidos', 0) + resumo.total_pedidos
+            destino['pagos_revenue'] = destino.get('pagos_revenue', 0) + resumo.valor_total
+
+    @staticmethod
+    def get_monthly(year, month=None):
+        """
+        Breakdown mensal do ano para DTF e PedidoFabrica.
+        Lê o ResumoMensal do ano (uma leitura por faixa de datas), independente
+        de quantos pedidos existam.
+        """
+        meses = [month] if month else list(range(1, 13))
+
+        por_mes_tipo = {}
+        por_tipo_ano = {}
+        pedidos_por_mes = {}
+        for resumo in ResumoMensal.objects.filter(
+            mes__gte=date(year, 1, 1), mes__lt=date(year + 1, 1, 1)
+        ):
+            m = resumo.mes.month
+            if resumo.tipo_produto == ResumoMensal.TIPO_PEDIDO_FABRICA:
+                agg = pedidos_por_mes.setdefault(m, {'total_pedidos': 0, 'total_pecas': 0})
+                agg['total_pedidos'] += resumo.total_pedidos
+                agg['total_pecas'] += resumo.unidades
+                continue
+            if not resumo.total_pedidos:
+                continue
+            # Os cards por tipo sempre refletem o ano inteiro, mesmo com filtro de mês
+            ReportService._somar(por_tipo_ano.setdefault(resumo.tipo_produto, {}), resumo)
+            ReportService._somar(por_mes_tipo.setdefault((m, resumo.tipo_produto), {}), resumo)
+
+        dtf_monthly = []
+        dtf_by_type_monthly = []
+        revenue_received_monthly = []
+
+        for m in meses:
+            total_mes = {}
+            for tipo_val, tipo_label in DTFVendor.TIPOS_PRODUTO:
+                agg = por_mes_tipo.get((m, tipo_val))
+                if not agg:
+                    continue
+                for chave in ('total_pedidos', 'total_revenue', 'pagos_pedidos', 'pagos_revenue'):
+                    total_mes[chave] = total_mes.get(chave, 0) + agg.get(chave, 0)
+                dtf_by_type_monthly.append({'mes': m, **ReportService._linha_tipo(tipo_val, tipo_label, agg)})
+
+            dtf_monthly.append({
+                'mes': m,
+                'total_pedidos': total_mes.get('total_pedidos', 0),
+                'total_revenue': float(total_mes.get('total_revenue', 0)),
+            })
+            revenue_received_monthly.append({
+                'mes': m,
+                'total_pedidos': total_mes.get('pagos_pedidos', 0),
+                'total_recebido': float(total_mes.get('pagos_revenue', 0)),
+            })
+
+        dtf_by_type = [
+            ReportService._linha_tipo(tipo_val, tipo_label, por_tipo_ano[tipo_val])
+            for tipo_val, tipo_label in DTFVendor.TIPOS_PRODUTO
+            if tipo_val in por_tipo_ano
+        ]
+
+        pedido_monthly = [
+            {'mes': m, **pedidos_por_mes.get(m, {'total_pedidos': 0, 'total_pecas': 0})}
+            for m in meses
+        ]
+
+        return {
+            'year': year,
+            'dtf_monthly': dtf_monthly,
+            'dtf_by_type': dtf_by_type,
+            'dtf_by_type_monthly': dtf_by_type_monthly,
+            'pedido_monthly': pedido_monthly,
+            'revenue_received_monthly': revenue_received_monthly,
+        }
+
+    @staticmethod
+    def get_dtf_mes(year, month):
+        """Totais de DTF de um mês (quantidade, faturamento e soma do tamanho_cm)."""
+        totais = ResumoMensal.objects.filter(mes=date(year, month, 1)).exclude(
+            tipo_produto=ResumoMensal.TIPO_PEDIDO_FABRICA
+        ).aggregate(
+            total_pedidos=Sum('total_pedidos'),
+            valor_total=Sum('valor_total'),
+            tamanho_cm=Sum('tamanho_cm'),
+        )
+        return {
+            'total_pedidos': totais['total_pedidos'] or 0,
+            'valor_total': totais['valor_total'] or Decimal('0'),
+            'tamanho_cm': totais['tamanho_cm'] or Decimal('0'),
+        }
+
+    @staticmethod
+    def get_clients(year, limit=20):
+        """
+        Ranking de clientes por receita DTF no ano.
+        Uma única query agrupada por cliente, ordenada e limitada no banco.
+        """
+        ranking = (
+            DTFVendor.objects.filter(data_criacao__year=year)
+            .values('cliente_id', 'cliente__nome')
+            .annotate(
+                total_pedidos=Count('id'),
+                total_revenue=Sum('valor_total'),
+                cm_lineares=Sum('tamanho_cm', filter=Q(tipo_produto__in=['dtf_textil', 'dtf_uv'])),
+                cm_quadrados=Sum('tamanho_cm', filter=Q(tipo_produto='sublimacao')),
+                unidades_estampa=Sum(PricingService.quantidade_expression(), filter=Q(tipo_produto='estampa')),
+            )
+            # Sem valor_total (NULL) vai para o fim: no PostgreSQL o DESC põe NULL primeiro
+            .order_by(F('total_revenue').desc(nulls_last=True), 'cliente_id')[:limit]
+        )
+
+        return [
+            {
+                'cliente_id': linha['cliente_id'],
+                'cliente_nome': linha['cliente__nome'],
+                'total_pedidos': linha['total_pedidos'],
+                'total_revenue': float(linha['total_revenue'] or 0),
+                'metros_lineares': round(float(Decimal(linha['cm_lineares'] or 0) / Decimal('100')), 2),
+                'metros_quadrados': round(float(Decimal(linha['cm_quadrados'] or 0) / Decimal('10000')), 2),
+                'unidades_estampa': linha['unidades_estampa'] or 0,
+            }
+            for linha in ranking
+        ]
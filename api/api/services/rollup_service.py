@@ -0,0 +1,156 @@
+import logging
+from decimal import Decimal, ROUND_HALF_UP
+from django.db import transaction
+from django.db.models import F, Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from api.models import DTFVendor, PedidoFabrica, ResumoMensal
+from .pricing_service import PricingService
+from .report_cache import ReportCache
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_VALORES = ('total_pedidos', 'valor_total', 'tamanho_cm',
+                  'metros_lineares', 'metros_quadrados', 'unidades')
+
+
+class RollupService:
+    """Manutenção incremental do ResumoMensal a partir de DTFVendor e PedidoFabrica"""
+
+    @staticmethod
+    def mes_de(data):
+        """Primeiro dia do mês (horário local) de um datetime."""
+        return timezone.localtime(data).date().replace(day=1)
+
+    @staticmethod
+    def contribuicao(obj):
+        """
+        Retorna (chave, valores) com o quanto um pedido soma no ResumoMensal,
+        ou None se ainda não tem data de criação.
+        """
+        if obj.data_criacao is None:
+            return None
+
+        if isinstance(obj, PedidoFabrica):
+            chave = (RollupService.mes_de(obj.data_criacao), ResumoMensal.TIPO_PEDIDO_FABRICA, False)
+            return chave, {
+                'total_pedidos': 1,
+                'valor_total': Decimal('0'),
+                'tamanho_cm': Decimal('0'),
+                'metros_lineares': Decimal('0'),
+                'metros_quadrados': Decimal('0'),
+                'unidades': obj.total_itens(),
+            }
+
+        tamanho = Decimal(obj.tamanho_cm or 0)
+        chave = (RollupService.mes_de(obj.data_criacao), obj.tipo_produto, obj.esta_pago)
+        return chave, {
+            'total_pedidos': 1,
+            # Valor como está na coluna (2 casas), senão o resumo acumula as sobras
+            'valor_total': Decimal(obj.valor_total or 0).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
+            'tamanho_cm': tamanho,
+            'metros_lineares': tamanho / Decimal('100') if obj.tipo_produto in ('dtf_textil', 'dtf_uv') else Decimal('0'),
+            'metros_quadrados': tamanho / Decimal('10000') if obj.tipo_produto == 'sublimacao' else Decimal('0'),
+            'unidades': (obj.quantidade or 1) if obj.tipo_produto == 'estampa' else 0,
+        }
+
+    @staticmethod
+    def aplicar(contribuicao, sinal=1):
+        """Soma (sinal=1) ou subtrai (sinal=-1) uma contribuição do resumo."""
+        if not contribuicao:
+            return
+        (mes, tipo_produto, esta_pago), valores = contribuicao
+        with transaction.atomic():
+            resumo, _ = ResumoMensal.objects.get_or_create(
+                mes=mes, tipo_produto=tipo_produto, esta_pago=esta_pago)
+            ResumoMensal.objects.filter(pk=resumo.pk).update(**{
+                campo: F(campo) + sinal * valores[campo] for campo in CAMPOS_VALORES
+            })
+
+    @staticmethod
+    def registrar_anterior(instance, old_obj):
+        """Guarda no instance o que o registro somava antes do save."""
+        instance._resumo_anterior = RollupService.contribuicao(old_obj)
+
+    @staticmethod
+    def atualizar(instance):
+        """Aplica o delta (antes/depois) de um save."""
+        anterior = getattr(instance, '_resumo_anterior', None)
+        atual = RollupService.contribuicao(instance)
+        if anterior == atual:
+            return
+        RollupService.aplicar(anterior, -1)
+        RollupService.aplicar(atual, 1)
+        instance._resumo_anterior = atual
+
+    @staticmethod
+    def remover(instance):
+        """Retira um registro deletado do resumo."""
+        RollupService.aplicar(RollupService.contribuicao(instance), -1)
+
+    @staticmethod
+    def rebuild(ano=None, tipo_produto=None):
+        """
+        Recalcula o ResumoMensal do zero (backfill).
+        Pode ser limitado a um ano e/ou a um tipo_produto.
+        """
+        dtfs = DTFVendor.objects.order_by()
+        pedidos = PedidoFabrica.objects.order_by()
+        resumos = ResumoMensal.objects.all()
+        if ano:
+            dtfs = dtfs.filter(data_criacao__year=ano)
+            pedidos = pedidos.filter(data_criacao__year=ano)
+            resumos = resumos.filter(mes__year=ano)
+        if tipo_produto:
+            dtfs = dtfs.filter(tipo_produto=tipo_produto)
+            resumos = resumos.filter(tipo_produto=tipo_produto)
+            if tipo_produto != ResumoMensal.TIPO_PEDIDO_FABRICA:
+                pedidos = pedidos.none()
+
+        acumulado = {}
+
+        def destino(chave):
+            return acumulado.setdefault(chave, dict.fromkeys(CAMPOS_VALORES, 0))
+
+        # DTF: agregado direto no banco a partir do preço congelado (valor_total)
+        linhas = (
+            dtfs.annotate(mes=TruncMonth('data_criacao'))
+            .values('mes', 'tipo_produto', 'esta_pago')
+            .annotate(
+                total_pedidos=Count('id'),
+                valor_total=Sum('valor_total'),
+                tamanho_cm=Sum('tamanho_cm'),
+                unidades=Sum(PricingService.quantidade_expression()),
+            )
+        )
+        for linha in linhas:
+            tipo = linha['tipo_produto']
+            tamanho = Decimal(linha['tamanho_cm'] or 0)
+            dados = destino((linha['mes'].date(), tipo, linha['esta_pago']))
+            dados['total_pedidos'] += linha['total_pedidos']
+            dados['valor_total'] += Decimal(linha['valor_total'] or 0)
+            dados['tamanho_cm'] += tamanho
+            if tipo in ('dtf_textil', 'dtf_uv'):
+                dados['metros_lineares'] += tamanho / Decimal('100')
+            elif tipo == 'sublimacao':
+                dados['metros_quadrados'] += tamanho / Decimal('10000')
+            elif tipo == 'estampa':
+                dados['unidades'] += linha['unidades'] or 0
+
+        # PedidoFabrica: a grade é JSON, soma das peças em Python numa leitura só
+        for pedido in pedidos.only('data_criacao', 'detalhes_tamanho').iterator(chunk_size=2000):
+            chave, valores = RollupService.contribuicao(pedido)
+            dados = destino(chave)
+            dados['total_pedidos'] += 1
+            dados['unidades'] += valores['unidades']
+
+        with transaction.atomic():
+            resumos.delete()
+            ResumoMensal.objects.bulk_create([
+                ResumoMensal(mes=mes, tipo_produto=tipo, esta_pago=pago, **valores)
+                for (mes, tipo, pago), valores in acumulado.items()
+            ], batch_size=500)
+
+        ReportCache.invalidar(ano)
+        logger.info(f"ResumoMensal reconstruído: {len(acumulado)} linhas")
+        return len(acumulado)
@@ -0,0 +1,39 @@
+import logging
+from django.db.models import Min, Max, Count
+from api.models import DTFVendor
+
+logger = logging.getLogger(__name__)
+
+
+class StatusService:
+    """Sincronização em massa do status derivado dos flags do DTFVendor"""
+
+    CHUNK_SIZE = 10000
+
+    @staticmethod
+    def sincronizar_dtf(chunk_size=None, progresso=None):
+        """
+        Corrige o status de todos os DTFVendor com UPDATEs em massa
+        (UPDATE ... WHERE status <> calculado), em faixas de pk.
+        `progresso(ate_pk, max_pk, atualizados)` é chamado a cada faixa.
+        Retorna (total, atualizados).
+        """
+        chunk_size = chunk_size or StatusService.CHUNK_SIZE
+        limites = DTFVendor.objects.aggregate(total=Count('id'), inicio=Min('id'), fim=Max('id'))
+        if not limites['total']:
+            return 0, 0
+
+        status = DTFVendor.status_expression()
+        atualizados = 0
+        for inicio in range(limites['inicio'], limites['fim'] + 1, chunk_size):
+            fim = inicio + chunk_size
+            atualizados += (
+                DTFVendor.objects.filter(id__gte=inicio, id__lt=fim)
+                .exclude(status=status)
+                .update(status=status)
+            )
+            if progresso:
+                progresso(min(fim - 1, limites['fim']), limites['fim'], atualizados)
+
+        logger.info(f"Status DTF sincronizado: {atualizados} de {limites['total']}")
+        return limites['total'], atualizados
@@ -1,10 +1,18 @@
-from django.db.models.signals import pre_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 import os
-from .models import DTFVendor, PedidoFabrica
+from .models import DTFVendor, PedidoFabrica, Orcamento, ItemOrcamento, DTFConfig
+from .services.rollup_service import RollupService
+from .services.report_cache import ReportCache
+from .services.pricing_service import PricingService
+from .services.kds_service import KDSService
+from .services.image_service import ImageService
+from .services.prerender_service import PreRenderService
+from .services.image_pipeline_service import ImagePipelineService
 
 @receiver(pre_save, sender=DTFVendor)
 def auto_delete_file_on_change(sender, instance, **kwargs):
+    ImagePipelineService.resolver(instance)
     if not instance.pk:
         return False
 
@@ -13,12 +21,19 @@ def auto_delete_file_on_change(sender, instance, **kwargs):
     except sender.DoesNotExist:
         return False
 
+    if not kwargs.get('raw'):
+        RollupService.registrar_anterior(instance, old_obj)
+        KDSService.registrar_anterior(instance, old_obj)
+        PreRenderService.registrar_anterior(instance, old_obj)
+        ImagePipelineService.registrar_anterior(instance, old_obj)
+
     # Verifica o Layout
     old_file = old_obj.layout_arquivo
     new_file = instance.layout_arquivo
     if old_file and old_file != new_file:
         if os.path.isfile(old_file.path):
             os.remove(old_file.path)
+        ImageService.remover_derivados(old_file.path)
 
     # Verifica o Comprovante
     old_comp = old_obj.comprovante_pagamento
@@ -26,9 +41,11 @@ def auto_delete_file_on_change(sender, instance, **kwargs):
     if old_comp and old_comp != new_comp:
         if os.path.isfile(old_comp.path):
             os.remove(old_comp.path)
+        ImageService.remover_derivados(old_comp.path)
 
 @receiver(pre_save, sender=PedidoFabrica)
 def auto_delete_layout_on_change(sender, instance, **kwargs):
+    ImagePipelineService.resolver(instance)
     if not instance.pk:
         return False
 
@@ -37,9 +54,77 @@ def auto_delete_layout_on_change(sender, instance, **kwargs):
     except sender.DoesNotExist:
         return False
 
+    if not kwargs.get('raw'):
+        RollupService.registrar_anterior(instance, old_obj)
+        KDSService.registrar_anterior(instance, old_obj)
+        PreRenderService.registrar_anterior(instance, old_obj)
+        ImagePipelineService.registrar_anterior(instance, old_obj)
+
     old_layout = old_obj.layout
     new_layout = instance.layout
-    
+
     if old_layout and old_layout != new_layout:
         if os.path.isfile(old_layout.path):
-            os.remove(old_layout.path)
\ No newline at end of file
+            os.remove(old_layout.path)
+        ImageService.remover_derivados(old_layout.path)
+
+@receiver(post_save, sender=DTFVendor)
+@receiver(post_save, sender=PedidoFabrica)
+def atualizar_resumo_mensal(sender, instance, raw=False, **kwargs):
+    # No restore de backup (raw) o resumo é reconstruído de uma vez no final
+    if raw:
+        return
+    RollupService.atualizar(instance)
+
+@receiver(post_delete, sender=DTFVendor)
+@receiver(post_delete, sender=PedidoFabrica)
+def remover_do_resumo_mensal(sender, instance, **kwargs):
+    RollupService.remover(instance)
+
+@receiver(post_save, sender=DTFVendor)
+@receiver(post_save, sender=PedidoFabrica)
+def notificar_kds(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    KDSService.notificar(instance)
+
+@receiver(post_delete, sender=DTFVendor)
+@receiver(post_delete, sender=PedidoFabrica)
+def notificar_kds_remocao(sender, instance, **kwargs):
+    KDSService.notificar(instance, removido=True)
+
+@receiver(post_save, sender=DTFVendor)
+@receiver(post_save, sender=PedidoFabrica)
+def pre_renderizar_pdf(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    PreRenderService.agendar(instance)
+
+@receiver(post_save, sender=DTFVendor)
+@receiver(post_save, sender=PedidoFabrica)
+def processar_imagens(sender, instance, raw=False, **kwargs):
+    # Upload já foi salvo como veio; comprime e gera derivados em segundo plano
+    if raw:
+        return
+    ImagePipelineService.agendar(instance)
+
+@receiver(post_save, sender=DTFVendor)
+@receiver(post_save, sender=PedidoFabrica)
+@receiver(post_save, sender=Orcamento)
+@receiver(post_delete, sender=DTFVendor)
+@receiver(post_delete, sender=PedidoFabrica)
+@receiver(post_delete, sender=Orcamento)
+def invalidar_cache_relatorios(sender, instance, **kwargs):
+    ReportCache.invalidar_por_data(instance.data_criacao)
+
+@receiver(post_save, sender=ItemOrcamento)
+@receiver(post_delete, sender=ItemOrcamento)
+def invalidar_cache_relatorios_item(sender, instance, **kwargs):
+    # O valor do orçamento é a soma dos itens
+    orcamento = Orcamento.objects.filter(pk=instance.orcamento_id).only('data_criacao').first()
+    ReportCache.invalidar_por_data(orcamento.data_criacao if orcamento else None)
+
+@receiver(post_save, sender=DTFConfig)
+@receiver(post_delete, sender=DTFConfig)
+def invalidar_tabela_precos(sender, instance, **kwargs):
+    PricingService.invalidar()
@@ -0,0 +1,51 @@
+"""
+Limpeza LRU de diretórios de cache em disco (PDFs, miniaturas).
+O "uso" de cada arquivo é o mtime: quem lê do cache faz os.utime no arquivo.
+"""
+import os
+import time
+
+# Temporários mais velhos que isso são sobras (render/escrita interrompida)
+TEMPORARIO_MAX_IDADE = 3600  # segundos
+
+
+def limpar_lru(diretorio, limite, extensao):
+    """
+    Remove os arquivos `extensao` usados há mais tempo até o total caber em
+    `limite` bytes. Retorna o total em uso se precisou apagar algo, senão None.
+    """
+    arquivos = []
+    total = 0
+    try:
+        entradas = list(os.scandir(diretorio))
+    except OSError:
+        return None
+    for entrada in entradas:
+        try:
+            st = entrada.stat()
+        except OSError:
+            continue
+        if entrada.name.endswith('.tmp'):
+            # Sobra de render que passou do timeout (o worker grava depois)
+            if time.time() - st.st_mtime > TEMPORARIO_MAX_IDADE:
+                try:
+                    os.remove(entrada.path)
+                except OSError:
+                    pass
+            continue
+        if not entrada.name.endswith(extensao):
+            continue
+        arquivos.append((st.st_mtime, st.st_size, entrada.path))
+        total += st.st_size
+
+    if total <= limite:
+        return None
+    for _, tamanho, caminho in sorted(arquivos):
+        try:
+            os.remove(caminho)
+        except OSError:
+            continue
+        total -= tamanho
+        if total <= limite:
+            break
+    return total
@@ -0,0 +1,202 @@
+"""
+Benchmark dos templates de PDF com dados sintéticos.
+
+Cada cenário monta o documento como a view faz (PDFService + template) e
+renderiza no mesmo tipo de worker do PDFPool, num processo só dele, para
+medir latência (p50/p95), pico de memória (RSS do worker) e tamanho do PDF.
+Nada é gravado no banco: as instâncias não são salvas e as imagens ficam
+num diretório temporário dentro do MEDIA_ROOT, apagado no fim.
+"""
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.utils import timezone
+from PIL import Image
+from api.models import Empresa, Cliente, Produto, Orcamento, ItemOrcamento, DTFVendor, PedidoFabrica
+from api.services.pdf_service import PDFService
+from .pdf_pool import renderizar, folhas_de_estilo, aquecer_worker, pico_rss
+from .utils import _renderizar_template
+
+# Imagens sintéticas (largura x altura em px): foto de celular ~12 MP e 24 MP
+IMAGENS = {
+    'sem': None,
+    'media': (4000, 3000),
+    'grande': (6000, 4000),
+}
+ITENS_ORCAMENTO = (1, 20, 100)
+GRADES = {
+    'pequena': {'P': 10, 'M': 20, 'G': 10},
+    'completa': {
+        **{t: 12 for t in PDFService.ORDEM_TAMANHOS},
+        **{t: 6 for t in PDFService.ORDEM_BL},
+        '2 anos': 4, '4 anos': 4, '6 anos': 4, '8 anos': 4, '10 anos': 4, '12 anos': 4,
+        'extra gg': 2,
+    },
+}
+
+
+def percentil(valores, p):
+    """Percentil por posição (nearest-rank)."""
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+class PDFBenchmark:
+    """Cenários sintéticos e medição dos templates pdfs/*.html"""
+
+    def __init__(self, diretorio_imagens):
+        self.diretorio = diretorio_imagens
+        self.cliente = Cliente(id=1, nome='Cliente Benchmark Comércio de Roupas LTDA')
+        self._imagens = {}
+
+    def imagem(self, tamanho, formato):
+        """Caminho relativo ao MEDIA_ROOT de uma imagem sintética (gerada uma vez)."""
+        if IMAGENS[tamanho] is None:
+            return ''
+        nome = f'{tamanho}.{formato}'
+        if nome not in self._imagens:
+            largura, altura = IMAGENS[tamanho]
+            # Gradiente + ruído suavizado: comprime como foto/arte real, não como cor chapada
+            ruido = Image.effect_noise((largura // 4, altura // 4), 48).resize((largura, altura))
+            gradiente = Image.linear_gradient('L').resize((largura, altura))
+            img = Image.merge('RGB', (ruido, gradiente, gradiente.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+            if formato == 'png':
+                img.putalpha(gradiente)
+                img.save(os.path.join(self.diretorio, nome), 'PNG', compress_level=1)
+            else:
+                img.save(os.path.join(self.diretorio, nome), 'JPEG', quality=90)
+            self._imagens[nome] = os.path.join(os.path.basename(self.diretorio), nome)
+        return self._imagens[nome]
+
+    def orcamento(self, template_id, n_itens):
+        empresa = Empresa(id=1, nome='Empresa Benchmark', template_id=template_id,
+                          cnpj='00.000.000/0001-00', endereco='Rua Exemplo, 100 - Centro',
+                          telefone='(00) 0000-0000', email='contato@example.com')
+        orcamento = Orcamento(id=1, empresa=empresa, cliente=self.cliente, agencia='Agência',
+                              campanha='Campanha de Verão', data_criacao=timezone.now())
+        produto = Produto(id=1, nome='Camiseta algodão fio 30.1 penteado', preco_base=Decimal('29.90'))
+        itens = [
+            ItemOrcamento(id=i + 1, orcamento=orcamento, produto=produto,
+                          produto_nome_no_ato=f'{produto.nome} #{i + 1}',
+                          descricao=f'Estampa frente e costas, cor {i % 7}',
+                          quantidade=10 + i, preco_negociado=Decimal('27.50'))
+            for i in range(n_itens)
+        ]
+        # Instâncias não salvas: os itens entram como se viessem do prefetch_related
+        orcamento._prefetched_objects_cache = {'itens': itens}
+        orcamento.valor_total = sum(item.subtotal for item in itens)
+        return PDFService.documento_orcamento(orcamento)
+
+    def dtf(self, imagem):
+        dtf = DTFVendor(id=1, cliente=self.cliente, tamanho_cm=Decimal('150.00'), tipo_produto='dtf_textil',
+                        valor_total=Decimal('52.50'), data_criacao=timezone.now(), foi_impresso='pendente',
+                        esta_pago=True, layout_arquivo=self.imagem(imagem, 'png'),
+                        comprovante_pagamento=self.imagem(imagem, 'jpg'))
+        return PDFService.documento_dtf(dtf)
+
+    def pedido(self, grade, imagem):
+        pedido = PedidoFabrica(id=1, cliente=self.cliente, nome_descricao='Uniforme equipe',
+                               descricao='Camiseta gola careca', material='Algodão',
+                               aplicacao_arte='Silk frente', detalhes_tamanho=GRADES[grade],
+                               layout=self.imagem(imagem, 'png'), data_criacao=timezone.now(),
+                               data_entrega=timezone.now() + timedelta(days=7))
+        return PDFService.documento_pedido(pedido)
+
+    def cenarios(self):
+        """
+        [(nome, imagens, montar_documento), ...] cobrindo todos os templates.
+        `imagens` ((tamanho, formato), ...) são geradas antes da medição.
+        """
+        cenarios = []
+        for template_id in (1, 2, 3):
+            for n in ITENS_ORCAMENTO:
+                cenarios.append((f'orcamento-{template_id}/itens-{n}', (),
+                                 lambda t=template_id, n=n: self.orcamento(t, n)))
+        for imagem in IMAGENS:
+            cenarios.append((f'dtf_pedido/imagem-{imagem}', ((imagem, 'png'), (imagem, 'jpg')),
+                             lambda i=imagem: self.dtf(i)))
+        for grade in GRADES:
+            for imagem in IMAGENS:
+                cenarios.append((f'pedido/grade-{grade}/imagem-{imagem}', ((imagem, 'png'),),
+                                 lambda g=grade, i=imagem: self.pedido(g, i)))
+        return cenarios
+
+    @staticmethod
+    def medir(montar, iteracoes):
+        """
+        Roda o cenário num worker novo (spawn, aquecido como os do PDFPool).
+        Só funções de pdf_pool vão para o worker: ele não carrega o Django.
+        A primeira execução (derivados de imagem ainda não gerados) vale como "frio".
+        """
+        executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=aquecer_worker)
+        fd, destino = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        try:
+            # Sobe o worker fora da medição (o PDFPool já sobe aquecido no start)
+            executor.submit(os.getpid).result()
+            tempos = []
+            for _ in range(iteracoes + 1):
+                inicio = time.perf_counter()
+                doc = montar()
+                html_string, _ = _renderizar_template(doc.template, doc.context, doc.volateis)
+                executor.submit(renderizar, html_string, folhas_de_estilo(doc.template), None, destino).result()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            frio, tempos = tempos[0], tempos[1:]
+            return {
+                'p50_ms': round(percentil(tempos, 50), 1),
+                'p95_ms': round(percentil(tempos, 95), 1),
+                'frio_ms': round(frio, 1),
+                'rss_mb': round((executor.submit(pico_rss).result() or 0) / 1024 / 1024, 1),
+                'bytes': os.path.getsize(destino),
+            }
+        finally:
+            executor.shutdown()
+            os.remove(destino)
+
+    @staticmethod
+    def executar(iteracoes=10, filtro=None, ao_medir=None):
+        """Mede todos os cenários (ou os que contêm `filtro`). Retorna {nome: métricas}."""
+        os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
+        diretorio = tempfile.mkdtemp(prefix='_benchmark_pdf_', dir=settings.MEDIA_ROOT)
+        try:
+            benchmark = PDFBenchmark(diretorio)
+            resultados = {}
+            for nome, imagens, montar in benchmark.cenarios():
+                if filtro and filtro not in nome:
+                    continue
+                for tamanho, formato in imagens:
+                    benchmark.imagem(tamanho, formato)
+                resultados[nome] = PDFBenchmark.medir(montar, iteracoes)
+                if ao_medir:
+                    ao_medir(nome, resultados[nome])
+            return resultados
+        finally:
+            # Leva junto os derivados de impressão gerados ao lado das imagens
+            shutil.rmtree(diretorio, ignore_errors=True)
+
+    @staticmethod
+    def comparar(atual, baseline, tolerancia):
+        """
+        Diferença percentual por métrica contra o baseline.
+        Retorna {nome: {metrica: delta_pct}} e a lista de cenários com p95 acima da tolerância.
+        """
+        deltas, regressoes = {}, []
+        for nome, metricas in atual.items():
+            base = baseline.get(nome)
+            if not base:
+                continue
+            deltas[nome] = {
+                chave: round((valor - base[chave]) / base[chave] * 100, 1) if base.get(chave) else None
+                for chave, valor in metricas.items()
+            }
+            if (deltas[nome].get('p95_ms') or 0) > tolerancia:
+                regressoes.append(nome)
+        return deltas, regressoes
@@ -0,0 +1,113 @@
+"""
+Cache em disco dos PDFs gerados, endereçado pelo conteúdo.
+
+A chave é o hash do HTML renderizado mais o estado (mtime/tamanho) de cada
+arquivo referenciado por file:// (layout, comprovante, logo). Se o pedido,
+o template ou uma imagem mudar, a chave muda sozinha: não há invalidação.
+O diretório é limitado por PDF_CACHE_MAX_BYTES, descartando os menos usados.
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+from urllib.parse import unquote
+from django.conf import settings
+from .disk_cache import limpar_lru
+
+logger = logging.getLogger(__name__)
+
+ARQUIVO_RE = re.compile(r'file://([^"\'\s)]+)')
+
+
+class PDFCache:
+    """LRU de PDFs em disco (um arquivo por chave)"""
+
+    _lock = threading.Lock()
+
+    @staticmethod
+    def diretorio():
+        return getattr(settings, 'PDF_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache', 'pdf'))
+
+    @staticmethod
+    def limite():
+        return getattr(settings, 'PDF_CACHE_MAX_BYTES', 500 * 1024 * 1024)
+
+    @staticmethod
+    def ativo():
+        return PDFCache.limite() > 0
+
+    @staticmethod
+    def chave(html_string, *extras):
+        """Hash do HTML + mtime/tamanho dos arquivos file:// que ele embute."""
+        h = hashlib.sha256(html_string.encode('utf-8'))
+        for caminho in sorted(set(ARQUIVO_RE.findall(html_string))):
+            caminho = unquote(caminho)
+            try:
+                st = os.stat(caminho)
+                h.update(f'\0{caminho}:{st.st_mtime_ns}:{st.st_size}'.encode())
+            except OSError:
+                h.update(f'\0{caminho}:ausente'.encode())
+        for extra in extras:
+            h.update(f'\0{extra}'.encode())
+        return h.hexdigest()
+
+    @staticmethod
+    def caminho(chave):
+        return os.path.join(PDFCache.diretorio(), f'{chave}.pdf')
+
+    @staticmethod
+    def get(chave):
+        """Caminho do PDF em cache (marcado como usado agora) ou None."""
+        caminho = PDFCache.caminho(chave)
+        try:
+            os.utime(caminho)
+        except OSError:
+            return None
+        return caminho
+
+    @staticmethod
+    def abrir(chave):
+        """
+        PDF em cache aberto para leitura (marcado como usado agora) ou None.
+        Aberto aqui, uma limpeza concorrente não o apaga mais a tempo de dar erro.
+        """
+        caminho = PDFCache.caminho(chave)
+        try:
+            arquivo = open(caminho, 'rb')
+        except OSError:
+            return None
+        try:
+            os.utime(caminho)
+        except OSError:
+            pass
+        return arquivo
+
+    @staticmethod
+    def temporario():
+        """Arquivo vazio no diretório do cache para o worker gravar o PDF."""
+        diretorio = PDFCache.diretorio()
+        os.makedirs(diretorio, exist_ok=True)
+        fd, temporario = tempfile.mkstemp(dir=diretorio, suffix='.tmp')
+        os.close(fd)
+        return temporario
+
+    @staticmethod
+    def put(chave, temporario):
+        """
+        Publica o PDF gravado em `temporario` (rename atômico, mesmo disco)
+        e aplica o limite de tamanho. Retorna o caminho.
+        """
+        caminho = PDFCache.caminho(chave)
+        os.replace(temporario, caminho)
+        PDFCache.limpar()
+        return caminho
+
+    @staticmethod
+    def limpar():
+        """Remove os PDFs usados há mais tempo até caber em PDF_CACHE_MAX_BYTES."""
+        with PDFCache._lock:
+            total = limpar_lru(PDFCache.diretorio(), PDFCache.limite(), '.pdf')
+        if total is not None:
+            logger.info(f"[PDF cache] Limpeza: {total} bytes em uso")
@@ -0,0 +1,249 @@
+"""
+Renderização de PDF (WeasyPrint) fora do processo do servidor.
+
+O layout do WeasyPrint é CPU puro e segura o GIL: rodando dentro do Daphne,
+um pico de impressões trava o resto da API. Aqui os renders vão para um pool
+de processos limitado (PDF_WORKERS), com fila máxima (PDF_QUEUE_LIMIT) e
+timeout por documento (PDF_TIMEOUT).
+"""
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PDFIndisponivel(Exception):
+    """WeasyPrint não disponível neste ambiente (ex.: Windows sem GTK)."""
+
+
+class PDFOcupado(Exception):
+    """Fila de renderização cheia."""
+
+
+class PDFTimeout(Exception):
+    """O documento passou do PDF_TIMEOUT."""
+
+
+# Folhas de estilo dos templates de pdfs/ (uma por template: css/<nome>.css)
+CSS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates', 'pdfs', 'css')
+
+# Estado por processo worker: CSS já parseados e a configuração de fontes
+_estilos = {}
+_font_config = None
+
+
+def folhas_de_estilo(template_name):
+    """Caminhos dos CSS de um template (ex.: 'pdfs/1.html' -> css/1.css)."""
+    nome = os.path.splitext(os.path.basename(template_name))[0]
+    caminho = os.path.join(CSS_DIR, f'{nome}.css')
+    return [caminho] if os.path.exists(caminho) else []
+
+
+def _weasyprint():
+    try:
+        import weasyprint
+        from weasyprint.text.fonts import FontConfiguration
+    except (ImportError, OSError) as e:
+        raise PDFIndisponivel(f"WeasyPrint indisponível: {e}")
+    return weasyprint, FontConfiguration
+
+
+def _carregar_estilos(caminhos):
+    """CSS parseados uma vez por processo (recarrega se o arquivo mudar) + FontConfiguration."""
+    global _font_config
+    weasyprint, FontConfiguration = _weasyprint()
+    if _font_config is None:
+        _font_config = FontConfiguration()
+    folhas = []
+    for caminho in caminhos:
+        versao = os.stat(caminho).st_mtime_ns
+        em_cache = _estilos.get(caminho)
+        if em_cache is None or em_cache[0] != versao:
+            em_cache = (versao, weasyprint.CSS(filename=caminho, font_config=_font_config))
+            _estilos[caminho] = em_cache
+        folhas.append(em_cache[1])
+    return weasyprint, folhas
+
+
+def renderizar(html_string, estilos=(), base_url=None, destino=None):
+    """
+    Executado no processo worker: HTML -> PDF.
+    Com `destino` o WeasyPrint grava direto no arquivo e devolve o caminho:
+    o PDF não atravessa o pipe do pool nem fica inteiro na memória do servidor.
+    """
+    weasyprint, folhas = _carregar_estilos(estilos)
+    result = weasyprint.HTML(string=html_string, base_url=base_url).write_pdf(
+        destino, stylesheets=folhas, font_config=_font_config)
+    return destino or result
+
+
+def renderizar_lote(documentos, base_url=None, destino=None):
+    """Executado no processo worker: [(html, estilos), ...] -> um PDF com todas as páginas."""
+    renderizados = []
+    for html_string, estilos in documentos:
+        weasyprint, folhas = _carregar_estilos(estilos)
+        renderizados.append(weasyprint.HTML(string=html_string, base_url=base_url).render(
+            stylesheets=folhas, font_config=_font_config))
+    paginas = [pagina for documento in renderizados for pagina in documento.pages]
+    result = renderizados[0].copy(paginas).write_pdf(destino)
+    return destino or result
+
+
+def pico_rss():
+    """Executado no worker: pico de memória residente do processo, em bytes."""
+    # No Linux o ru_maxrss herda o pico do processo pai; VmHWM é só deste processo
+    try:
+        with open('/proc/self/status') as f:
+            for linha in f:
+                if linha.startswith('VmHWM:'):
+                    return int(linha.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS informa em bytes, os demais em KB
+    return pico if sys.platform == 'darwin' else pico * 1024
+
+
+def aquecer_worker():
+    """
+    Initializer do worker: importa o WeasyPrint, parseia todos os CSS e
+    renderiza um documento de teste (carrega Pango e as fontes) antes do
+    primeiro pedido real.
+    """
+    try:
+        estilos = sorted(
+            os.path.join(CSS_DIR, nome) for nome in os.listdir(CSS_DIR) if nome.endswith('.css'))
+        for caminho in estilos:
+            _carregar_estilos([caminho])
+        renderizar('<html><body><p>Aquecimento <strong>PDF</strong> 0123456789</p></body></html>',
+                   estilos[:1])
+    except Exception as e:
+        logger.warning(f"[PDF] Aquecimento do worker falhou: {e}")
+
+
+class PDFPool:
+    """Pool de processos compartilhado pelo processo do servidor (criado sob demanda)"""
+
+    _executor = None
+    _vagas = None
+    _ocupados = 0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def config():
+        return {
+            'workers': getattr(settings, 'PDF_WORKERS', 2),
+            'fila': getattr(settings, 'PDF_QUEUE_LIMIT', 8),
+            'timeout': getattr(settings, 'PDF_TIMEOUT', 60),
+            'tarefas_por_worker': getattr(settings, 'PDF_MAX_TASKS_PER_CHILD', 100),
+            'aquecer': getattr(settings, 'PDF_WARMUP', True),
+        }
+
+    @classmethod
+    def _get_executor(cls):
+        with cls._lock:
+            if cls._executor is None:
+                config = cls.config()
+                # spawn: não herda threads/conexões do Daphne; reciclar o worker
+                # depois de N documentos segura vazamento de memória do WeasyPrint
+                cls._executor = ProcessPoolExecutor(
+                    max_workers=config['workers'],
+                    mp_context=multiprocessing.get_context('spawn'),
+                    max_tasks_per_child=config['tarefas_por_worker'] or None,
+                    initializer=aquecer_worker if config['aquecer'] else None,
+                )
+                # Em execução + aguardando na fila
+                cls._vagas = threading.BoundedSemaphore(config['workers'] + config['fila'])
+            return cls._executor, cls._vagas
+
+    @classmethod
+    def aquecer(cls):
+        """
+        Sobe os workers já no start do servidor (sem esperar), para o primeiro
+        PDF depois de um deploy não pagar import/CSS/fontes.
+        """
+        config = cls.config()
+        if os.name == "nt" or not config['workers'] or not config['aquecer']:
+            return
+        executor, _ = cls._get_executor()
+        # Com spawn o pool sobe todos os workers no primeiro submit; cada um roda aquecer_worker
+        executor.submit(os.getpid)
+
+    @classmethod
+    def _descartar(cls, executor):
+        """Descarta um pool quebrado (worker morreu) para o próximo pedido recriar."""
+        with cls._lock:
+            if cls._executor is executor:
+                cls._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    @classmethod
+    def _liberar(cls, vagas):
+        with cls._lock:
+            cls._ocupados -= 1
+        vagas.release()
+
+    @classmethod
+    def submit(cls, funcao, *args, timeout=None, esperar_vaga=False, especulativo=False):
+        """
+        Executa funcao(*args) num worker e devolve o resultado.
+        Levanta PDFOcupado se a fila estiver cheia (ou, com esperar_vaga, se não
+        abrir vaga dentro do timeout) e PDFTimeout se passar do limite
+        (PDF_TIMEOUT, ou `timeout` para documentos grandes).
+        `especulativo` (pré-render): só entra se houver worker livre agora, nunca na fila.
+        """
+        if os.name == "nt":
+            raise PDFIndisponivel("PDF desativado no ambiente local")
+
+        config = cls.config()
+        if not config['workers']:
+            # PDF_WORKERS=0: renderiza no próprio processo (desenvolvimento)
+            return funcao(*args)
+
+        timeout = timeout or config['timeout']
+        executor, vagas = cls._get_executor()
+        if especulativo:
+            # Conferir e reservar juntos: dois pré-renders não ocupam o mesmo worker livre
+            with cls._lock:
+                if cls._ocupados >= config['workers']:
+                    raise PDFOcupado("Nenhum worker livre para pré-render")
+                cls._ocupados += 1
+            if not vagas.acquire(blocking=False):
+                with cls._lock:
+                    cls._ocupados -= 1
+                raise PDFOcupado("Fila de PDF cheia, tente novamente em instantes")
+        else:
+            # Requisições interativas não esperam; jobs em segundo plano aguardam a vez
+            if not vagas.acquire(blocking=esperar_vaga, timeout=timeout if esperar_vaga else None):
+                raise PDFOcupado("Fila de PDF cheia, tente novamente em instantes")
+            with cls._lock:
+                cls._ocupados += 1
+
+        try:
+            future = executor.submit(funcao, *args)
+        except BrokenProcessPool:
+            cls._liberar(vagas)
+            cls._descartar(executor)
+            raise
+        # A vaga só volta quando o worker termina de fato (mesmo após timeout)
+        future.add_done_callback(lambda _: cls._liberar(vagas))
+
+        try:
+            return future.result(timeout=timeout)
+        except FuturesTimeout:
+            future.cancel()
+            logger.warning(f"[PDF] Render passou de {timeout}s")
+            raise PDFTimeout("Tempo limite ao gerar o PDF")
+        except BrokenProcessPool:
+            cls._descartar(executor)
+            raise
@@ -0,0 +1,88 @@
+"""
+Miniaturas WebP das imagens de mídia, geradas sob demanda.
+
+Servidas em /api/media/thumb/<tamanho>/<caminho>. A chave inclui o
+mtime/tamanho do original: se o arquivo mudar, a miniatura é refeita.
+O diretório é limitado por THUMB_CACHE_MAX_BYTES, descartando as menos usadas.
+"""
+import hashlib
+import logging
+import os
+import threading
+from django.conf import settings
+from django.core.files.storage import default_storage
+from api.services.image_service import ImageService, ImagemOcupada
+from .disk_cache import limpar_lru
+
+logger = logging.getLogger(__name__)
+
+# Tamanhos aceitos (lado maior, px): evita gerar uma miniatura por valor arbitrário
+TAMANHOS = (160, 320, 640, 1280)
+
+
+class ThumbCache:
+    """LRU de miniaturas em disco (um .webp por original e tamanho)"""
+
+    _lock = threading.Lock()
+
+    @staticmethod
+    def diretorio():
+        return getattr(settings, 'THUMB_CACHE_DIR', os.path.join(settings.BASE_DIR, 'cache', 'thumbs'))
+
+    @staticmethod
+    def limite():
+        return getattr(settings, 'THUMB_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+
+    @staticmethod
+    def chave(nome, tamanho):
+        """
+        (hash do caminho relativo + estado do original + tamanho, caminho do
+        original, mtime do original). Hash None se o original não existe.
+        """
+        # storage.path barra caminhos fora do MEDIA_ROOT (SuspiciousFileOperation)
+        caminho = default_storage.path(nome)
+        try:
+            st = os.stat(caminho)
+        except OSError:
+            return None, caminho, None
+        h = hashlib.sha256(f'{nome}:{st.st_mtime_ns}:{st.st_size}:{tamanho}'.encode())
+        return h.hexdigest(), caminho, st.st_mtime
+
+    @staticmethod
+    def abrir(nome, tamanho):
+        """
+        (miniatura aberta para leitura, chave), gerando se preciso.
+        Levanta FileNotFoundError se o original não existe ou não é imagem
+        e ImagemOcupada se o orçamento de decodificação estiver esgotado.
+        """
+        chave, original, _ = ThumbCache.chave(nome, tamanho)
+        if chave is None:
+            raise FileNotFoundError(nome)
+        caminho = os.path.join(ThumbCache.diretorio(), f'{chave}.webp')
+        try:
+            os.utime(caminho)
+            return open(caminho, 'rb'), chave
+        except OSError:
+            pass
+
+        os.makedirs(ThumbCache.diretorio(), exist_ok=True)
+        try:
+            ImageService.miniatura(original, tamanho, caminho)
+        except ImagemOcupada:
+            raise
+        except Exception as e:
+            # Não é imagem (UnidentifiedImageError), arquivo corrompido etc.
+            logger.info(f"[Thumb] {nome} sem miniatura: {e}")
+            raise FileNotFoundError(nome)
+        # Aberto antes da limpeza: ela pode apagar o próprio arquivo
+        arquivo = open(caminho, 'rb')
+        ThumbCache.limpar()
+        return arquivo, chave
+
+    @staticmethod
+    def limpar():
+        """Remove as miniaturas usadas há mais tempo até caber em THUMB_CACHE_MAX_BYTES."""
+        with ThumbCache._lock:
+            total = limpar_lru(ThumbCache.diretorio(), ThumbCache.limite(), '.webp')
+        if total is not None:
+            logger.info(f"[Thumb] Limpeza: {total} bytes em uso")
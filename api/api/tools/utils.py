@@ -1,19 +1,171 @@
-from django.template.loader import render_to_string
-from django.http import HttpResponse
 import os
+import shutil
+import tempfile
+import zipfile
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.http import HttpResponse, HttpResponseNotModified, FileResponse
+from django.utils.http import parse_etags
+from .pdf_pool import (
+    PDFPool, PDFIndisponivel, PDFOcupado, PDFTimeout, renderizar, renderizar_lote, folhas_de_estilo,
+)
+from .pdf_cache import PDFCache
+
 
-if os.name != "nt":
-    from weasyprint import HTML
+def _chave(html_chave, estilos, *extras):
+    """Chave do cache: HTML + versão dos CSS usados."""
+    versoes = [f'{caminho}:{os.stat(caminho).st_mtime_ns}' for caminho in estilos]
+    return PDFCache.chave(html_chave, *versoes, *extras)
 
-def gerar_pdf_from_html(template_name, context, filename):
-    if os.name == "nt":
-        return HttpResponse("PDF desativado no ambiente local", status=501)
 
+def _renderizar_template(template_name, context, volateis=()):
+    """HTML final e HTML usado na chave do cache (sem os campos voláteis)."""
     html_string = render_to_string(template_name, context)
-    html = HTML(string=html_string)
-    result = html.write_pdf()
+    if volateis:
+        return html_string, render_to_string(template_name, {**context, **dict.fromkeys(volateis)})
+    return html_string, html_string
+
+
+def _resposta_erro(erro):
+    if isinstance(erro, PDFOcupado):
+        response = HttpResponse("Muitos PDFs na fila, tente novamente em instantes", status=503)
+        response['Retry-After'] = '5'
+        return response
+    if isinstance(erro, PDFTimeout):
+        return HttpResponse("Tempo limite ao gerar o PDF", status=504)
+    return HttpResponse("PDF desativado no ambiente local", status=501)
+
+
+def _remover(caminho):
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+
+def obter_pdf(chave, gerar):
+    """
+    PDF aberto para leitura, do cache ou renderizado com gerar(destino).
+    O worker grava direto no arquivo: o PDF nunca fica inteiro na memória.
+    O arquivo é aberto antes que a limpeza do cache (ou a remoção do temporário,
+    com o cache desativado) possa apagá-lo; quem chamou fecha depois de usar.
+    """
+    if PDFCache.ativo():
+        arquivo = PDFCache.abrir(chave)
+        if arquivo is not None:
+            return arquivo
+        temporario = PDFCache.temporario()
+    else:
+        fd, temporario = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+
+    try:
+        gerar(temporario)
+        arquivo = open(temporario, 'rb')
+    except BaseException:
+        _remover(temporario)
+        raise
+
+    # O descritor aberto mantém o conteúdo mesmo se o arquivo for apagado
+    if PDFCache.ativo():
+        PDFCache.put(chave, temporario)
+    else:
+        _remover(temporario)
+    return arquivo
+
+
+def preparar_pdf(documentos, progresso=None):
+    """
+    Renderiza os templates de uma lista de DocumentoPDF e devolve
+    (chave do cache, gerar), onde gerar(destino, **opcoes_do_pool) grava o PDF:
+    um documento vai para renderizar, vários viram páginas de um PDF só.
+    `progresso(feitos, total)` é chamado a cada template renderizado.
+    """
+    htmls, estilos = [], []
+    for i, doc in enumerate(documentos, 1):
+        htmls.append(_renderizar_template(doc.template, doc.context, doc.volateis))
+        estilos.append(folhas_de_estilo(doc.template))
+        if progresso:
+            progresso(i, len(documentos))
+
+    if len(documentos) == 1:
+        (html_string, html_chave), = htmls
+        return (
+            _chave(html_chave, estilos[0]),
+            lambda destino, **opcoes: PDFPool.submit(
+                renderizar, html_string, estilos[0], None, destino, **opcoes),
+        )
+
+    chave = _chave('\0'.join(html_chave for _, html_chave in htmls),
+                   sorted({c for lista in estilos for c in lista}), 'lote')
+    lote = [(html, folhas) for (html, _), folhas in zip(htmls, estilos)]
+    return chave, lambda destino, **opcoes: PDFPool.submit(renderizar_lote, lote, None, destino, **opcoes)
+
+
+def _responder_pdf(chave, gerar, filename, request=None):
+    etag = f'"{chave}"'
+    if request is not None and etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    try:
+        arquivo = obter_pdf(chave, gerar)
+    except (PDFIndisponivel, PDFOcupado, PDFTimeout) as e:
+        return _resposta_erro(e)
+
+    # FileResponse envia em blocos (ou via sendfile no servidor)
+    response = FileResponse(arquivo, as_attachment=True, filename=filename,
+                            content_type='application/pdf')
+    response['ETag'] = etag
+    # O navegador pode guardar, mas sempre revalida (304 se nada mudou)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def gerar_pdf_from_html(template_name, context, filename, request=None, volateis=()):
+    """
+    Renderiza o template e devolve o PDF, passando pelo cache em disco.
+    `volateis`: chaves do context que não devem invalidar o cache
+    (ex.: 'now' do "Gerado em" — num acerto vale a data da primeira geração).
+    """
+    # O template é renderizado aqui (precisa do ORM); só o WeasyPrint vai para o pool
+    html_string, html_chave = _renderizar_template(template_name, context, volateis)
+    estilos = folhas_de_estilo(template_name)
+    return _responder_pdf(
+        _chave(html_chave, estilos),
+        lambda destino: PDFPool.submit(renderizar, html_string, estilos, None, destino),
+        filename, request,
+    )
+
+
+def gerar_pdf_lote(documentos, filename, request=None):
+    """
+    Vários documentos (DocumentoPDF) como páginas de um único PDF,
+    renderizado numa passada só do WeasyPrint.
+    """
+    chave, gerar = preparar_pdf(documentos)
+    timeout = getattr(settings, 'PDF_TIMEOUT', 60) * max(1, len(documentos) // 10)
+    return _responder_pdf(chave, lambda destino: gerar(destino, timeout=timeout), filename, request)
+
 
-    response = HttpResponse(result, content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+def gerar_zip_lote(documentos, filename):
+    """Vários documentos como um ZIP com um PDF por pedido (cada um passa pelo cache)."""
+    arquivo = tempfile.TemporaryFile()
+    try:
+        with zipfile.ZipFile(arquivo, 'w', zipfile.ZIP_STORED) as zf:
+            nomes = set()
+            for doc in documentos:
+                nome = doc.filename
+                if nome in nomes:
+                    nome = f'{len(nomes)}-{nome}'
+                nomes.add(nome)
+                # PDF já é comprimido: ZIP_STORED evita gastar CPU à toa
+                with obter_pdf(*preparar_pdf([doc])) as pdf, zf.open(nome, 'w') as destino:
+                    shutil.copyfileobj(pdf, destino)
+    except (PDFIndisponivel, PDFOcupado, PDFTimeout) as e:
+        arquivo.close()
+        return _resposta_erro(e)
 
-    return response
\ No newline at end of file
+    arquivo.seek(0)
+    return FileResponse(arquivo, as_attachment=True, filename=filename, content_type='application/zip')
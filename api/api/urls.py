@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import EmpresaViewSet, PedidoFabricaViewSet, ClienteViewSet, ProdutoViewSet, OrcamentoViewSet, DTFVendorViewSet, UserViewSet, UserMeView, DashboardStatsView, ReportsView, ChangePasswordView, BackupExportView, BackupImportView, DTFConfigViewSet, ConfiguracaoLojaViewSet, ClientReportView, DTFOrdersReportView, FabricaOrdersReportView, KDSPanelView, SyncDTFStatusView
+from .views import EmpresaViewSet, PedidoFabricaViewSet, ClienteViewSet, ProdutoViewSet, OrcamentoViewSet, DTFVendorViewSet, UserViewSet, UserMeView, DashboardStatsView, ReportsView, ChangePasswordView, BackupExportView, BackupImportView, DTFConfigViewSet, ConfiguracaoLojaViewSet, ClientReportView, DTFOrdersReportView, FabricaOrdersReportView, KDSPanelView, SyncDTFStatusView, ReportCacheStatsView, PDFJobViewSet, ImageProfileStatsView, ThumbnailView
 from .evolution_views import WhatsAppInstanceViewSet
 from .webhook_views import WhatsAppWebhookView, WhatsAppWebhookConfigureView
 
@@ -13,6 +13,7 @@ router.register(r'dtf', DTFVendorViewSet)
 router.register(r'usuarios', UserViewSet)
 router.register(r'pedidos', PedidoFabricaViewSet)
 router.register(r'whatsapp-instances', WhatsAppInstanceViewSet)
+router.register(r'pdf-jobs', PDFJobViewSet, basename='pdf-jobs')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -20,7 +21,10 @@ urlpatterns = [
     path('dashboard/', DashboardStatsView.as_view(), name='dashboard-stats'),
     path('reports/monthly/', ReportsView.as_view(), name='reports-monthly'),
     path('reports/clients/', ClientReportView.as_view(), name='reports-clients'),
+    path('reports/cache-stats/', ReportCacheStatsView.as_view(), name='reports-cache-stats'),
+    path('reports/image-profiles/', ImageProfileStatsView.as_view(), name='reports-image-profiles'),
     path('reports/dtf-orders/', DTFOrdersReportView.as_view(), name='reports-dtf-orders'),
+    path('media/thumb/<int:tamanho>/<path:caminho>', ThumbnailView.as_view(), name='media-thumb'),
     path('kds/', KDSPanelView.as_view(), name='kds-panel'),
     path('sync-status/', SyncDTFStatusView.as_view(), name='dtf-sync-status'),
     path('reports/fabrica-orders/', FabricaOrdersReportView.as_view(), name='reports-fabrica-orders'),
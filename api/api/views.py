@@ -1,50 +1,38 @@
-from datetime import timedelta, datetime
 from django.conf import settings
-from PIL import Image  # Pip install Pillow
 import os, json
 from django.contrib.auth.hashers import check_password
-from num2words import num2words
 from django.utils import timezone
 from django.db.models import Count, Sum
-from rest_framework import viewsets, permissions, filters, status
+from rest_framework import viewsets, mixins, permissions, filters, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from django_filters.rest_framework import DjangoFilterBackend
 from decimal import Decimal
-from .models import Empresa, Cliente, Produto, Orcamento, ItemOrcamento, DTFVendor, Usuario, PedidoFabrica, DTFConfig, ConfiguracaoLoja
+from .models import Empresa, Cliente, Produto, Orcamento, ItemOrcamento, DTFVendor, Usuario, PedidoFabrica, DTFConfig, ConfiguracaoLoja, PDFJob
 from .permissions import IsAdminUserCustom, IsVendedor, IsFinanceiro, IsMaquina
 from .serializers import (
     EmpresaSerializer, ClienteSerializer,
     ProdutoSerializer, OrcamentoSerializer, DTFVendorSerializer, UsuarioSerializer,
-    UserMeSerializer, PedidoFabricaSerializer, DTFConfigSerializer, ConfiguracaoLojaSerializer
+    UserMeSerializer, PedidoFabricaSerializer, DTFConfigSerializer, ConfiguracaoLojaSerializer,
+    PDFJobSerializer
 )
-from .tools.utils import gerar_pdf_from_html
+from .tools.utils import gerar_pdf_from_html, gerar_pdf_lote, gerar_zip_lote
+from .tools.thumb_cache import ThumbCache, TAMANHOS as THUMB_TAMANHOS
+from .services.pdf_service import PDFService
+from .services.image_service import ImagemOcupada
 from .services.backup_service import BackupService
-
-import base64
-from io import BytesIO
-
-
-def processar_imagem_base64(campo_arquivo):
-    if not campo_arquivo or not os.path.exists(campo_arquivo.path):
-        return None
-
-    try:
-        with Image.open(campo_arquivo.path) as img:
-            largura, altura = img.size
-            # Lógica: Se estiver em pé, deita
-            if altura > largura:
-                img = img.rotate(90, expand=True)
-
-            # Converte a imagem para Base64 em memória
-            buffered = BytesIO()
-            img.save(buffered, format="PNG")
-            img_str = base64.b64encode(buffered.getvalue()).decode()
-            return f"data:image/png;base64,{img_str}"
-    except Exception as e:
-        print(f"Erro Base64: {e}")
-        return None
+from .services.report_service import ReportService
+from .services.report_cache import ReportCache
+from .services.dashboard_service import DashboardService
+from .services.kds_service import KDSService
+from .services.status_service import StatusService
+from .services.pdf_job_service import PDFJobService
+from .services.image_pipeline_service import ImagePipelineService
+from .services.export_service import ExportService
+from .renderers import CSVRenderer, XLSXRenderer, NDJSONRenderer
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -87,14 +75,71 @@ class ProdutoViewSet(viewsets.ModelViewSet):
     ordering = ['-id']
 
 
+class ImpressaoLoteMixin:
+    """
+    Impressão em lote para viewsets de pedidos: recebe `ids` (query string
+    "1,2,3", {"ids": [...]} ou a própria lista no corpo do POST) ou usa os
+    filtros do próprio viewset, mais `hoje=true` para ficar só com os pedidos do dia.
+    """
+
+    def queryset_lote(self, request):
+        ids = None
+        if request.method == 'POST':
+            # Corpo {"ids": [...]} ou a lista de ids direto
+            if isinstance(request.data, list):
+                ids = request.data
+            elif hasattr(request.data, 'get'):
+                ids = request.data.get('ids')
+            else:
+                raise ValidationError({'ids': 'Informe uma lista de ids numéricos.'})
+        if ids is None and request.query_params.get('ids'):
+            ids = request.query_params['ids']
+        if isinstance(ids, str):
+            ids = ids.split(',')
+        if ids is not None:
+            try:
+                ids = [int(i) for i in ids]
+            except (TypeError, ValueError):
+                raise ValidationError({'ids': 'Informe uma lista de ids numéricos.'})
+            qs = self.get_queryset().filter(pk__in=ids)
+        else:
+            qs = self.filter_queryset(self.get_queryset())
+            if request.query_params.get('hoje') in ('1', 'true', 'True'):
+                qs = qs.filter(data_criacao__date=timezone.localdate())
+        return qs.select_related('cliente').order_by('data_criacao', 'id')
+
+    # Tipo do PDFJob criado com ?async=true
+    tipo_pdf_job = None
+
+    def responder_lote(self, request, montar_documento, prefixo):
+        limite = getattr(settings, 'PDF_BATCH_LIMIT', 100)
+        objetos = list(self.queryset_lote(request)[:limite + 1])
+        if not objetos:
+            return Response({'error': 'Nenhum pedido encontrado para imprimir.'}, status=404)
+        if len(objetos) > limite:
+            return Response({'error': f'Máximo de {limite} pedidos por lote.'}, status=400)
+
+        if request.query_params.get('async') in ('1', 'true', 'True'):
+            # Gera em segundo plano: o cliente acompanha em /api/pdf-jobs/<id>/
+            job = PDFJobService.criar(request.user, self.tipo_pdf_job, [obj.pk for obj in objetos],
+                                      f'{prefixo}-lote-{timezone.localdate():%Y-%m-%d}.pdf')
+            return PDFJobViewSet.resposta_criado(job, request)
+
+        documentos = [montar_documento(obj) for obj in objetos]
+        nome = f'{prefixo}-lote-{timezone.localdate():%Y-%m-%d}'
+        if request.query_params.get('formato') == 'zip':
+            return gerar_zip_lote(documentos, f'{nome}.zip')
+        return gerar_pdf_lote(documentos, f'{nome}.pdf', request=request)
+
+
 class OrcamentoViewSet(viewsets.ModelViewSet):
     # O prefetch_related evita o problema de performance "N+1" nas consultas
-    queryset = Orcamento.objects.all().prefetch_related(
+    queryset = Orcamento.objects.com_valor_total().prefetch_related(
         'itens__produto', 'cliente', 'empresa')
     serializer_class = OrcamentoSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['cliente__nome', 'empresa__nome', 'itens__produto__nome']
-    ordering_fields = ['id', 'data_criacao']
+    ordering_fields = ['id', 'data_criacao', 'valor_total']
     ordering = ['-data_criacao']
 
     def get_permissions(self):
@@ -103,29 +148,14 @@ class OrcamentoViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def gerar_pdf(self, request, pk=None):
-        orcamento = self.get_object()
-        # Adicionando o valor por extenso
-        valor_extenso = num2words(
-            orcamento.valor_total, lang='pt_BR', to='currency')
-        logo_path = os.path.join(
-            settings.BASE_DIR, 'static', 'logo-yasprint.png')
-        context = {
-            'orcamento': orcamento,
-            'itens': orcamento.itens.all(),
-            'valor_extenso': valor_extenso,
-            'logo_url': f'file://{logo_path}'
-        }
+        doc = PDFService.documento_orcamento(self.get_object())
+        return gerar_pdf_from_html(doc.template, doc.context, doc.filename, request=request)
 
-        tid = orcamento.empresa.template_id
-        name = f'{orcamento.empresa.nome}-{orcamento.cliente.nome}-{orcamento.id}'
 
-        template_nome = f'pdfs/{tid}.html'
-        return gerar_pdf_from_html(template_nome, context, f'{name}.pdf')
-
-
-class DTFVendorViewSet(viewsets.ModelViewSet):
-    queryset = DTFVendor.objects.all().order_by('-data_criacao')
+class DTFVendorViewSet(ImpressaoLoteMixin, viewsets.ModelViewSet):
+    queryset = DTFVendor.objects.select_related('cliente').order_by('-data_criacao')
     serializer_class = DTFVendorSerializer
+    tipo_pdf_job = 'dtf'
 
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['cliente', 'foi_impresso', 'esta_pago', 'foi_entregue', 'status']
@@ -151,36 +181,16 @@ class DTFVendorViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def gerar_pdf(self, request, pk=None):
-        dtf = self.get_object()
-
-        def obter_dados_imagem(campo_arquivo):
-            if not campo_arquivo or not hasattr(campo_arquivo, 'path') or not os.path.exists(campo_arquivo.path):
-                return None, False
+        doc = PDFService.documento_dtf(self.get_object())
+        return gerar_pdf_from_html(doc.template, doc.context, doc.filename, request=request)
 
-            try:
-                path = campo_arquivo.path
-                with Image.open(path) as img:
-                    largura, altura = img.size
-                    # Apenas detecta se precisa girar (altura > largura)
-                    precisa_girar = altura > largura
-                return 'file://' + path.replace('\\', '/'), precisa_girar
-            except Exception:
-                return None, False
-
-        layout_url, girar_layout = obter_dados_imagem(dtf.layout_arquivo)
-        comp_url, girar_comp = obter_dados_imagem(dtf.comprovante_pagamento)
-
-        context = {
-            'dtf': dtf,
-            'layout_path': layout_url,
-            'rotate_layout': girar_layout,
-            'comprovante_path': comp_url,
-            'rotate_comprovante': girar_comp,
-        }
-
-        name = f'dtf-{dtf.cliente.nome}-{dtf.id}'
-
-        return gerar_pdf_from_html('pdfs/dtf_pedido.html', context, f'{name}.pdf')
+    @action(detail=False, methods=['get', 'post'])
+    def imprimir_lote(self, request):
+        """
+        Folhas de vários DTFs num PDF só (ou ?formato=zip, ou ?async=true para um PDFJob).
+        Ex.: ?esta_pago=true&foi_impresso=pendente&hoje=true, ou ?ids=1,2,3
+        """
+        return self.responder_lote(request, PDFService.documento_dtf, 'dtf')
 
 
 class ConfiguracaoLojaViewSet(viewsets.ModelViewSet):
@@ -235,193 +245,102 @@ class KDSPanelView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        hoje = timezone.localtime().date()
-
-        hoje_start = timezone.make_aware(
-            datetime.combine(hoje, datetime.min.time())
-        )
-        amanha_start = hoje_start + timedelta(days=1)
-        dois_dias_atras = hoje_start - timedelta(days=2)
-
-        # ===========================
-        # DTF
-        # ===========================
-
-        dtf_hoje = DTFVendor.objects.filter(
-            data_criacao__gte=hoje_start,
-            data_criacao__lt=amanha_start
-        ).select_related("cliente").order_by("data_criacao")
-
-        # Apenas pedidos pagos entram no fluxo do KDS
-        dtf_pagos = dtf_hoje.filter(esta_pago=True)
-
-        # Pagou, mas ainda não imprimiu
-        dtf_fila = dtf_pagos.filter(
-            foi_impresso="pendente",
-            foi_entregue=False
-        )
-
-        # Já imprimiu, falta entregar
-        dtf_prontos = dtf_pagos.filter(
-            foi_impresso="impresso",
-            foi_entregue=False
-        )
-
-        # Entregues
-        dtf_entregues = dtf_pagos.filter(
-            foi_entregue=True
-        )
+        return Response(KDSService.snapshot())
 
-        # Urgentes = pagos há mais de 2 dias e ainda não entregues
-        dtf_urgentes = DTFVendor.objects.filter(
-            esta_pago=True,
-            foi_entregue=False,
-            data_criacao__lt=dois_dias_atras
-        ).select_related("cliente").order_by("data_criacao")[:10]
-
-        def serialize_dtf(item):
-            if item.foi_entregue:
-                status = "Finalizado"
-            elif item.foi_impresso == "impresso":
-                status = "Pronto"
-            elif item.esta_pago:
-                status = "Em Produção"
-            else:
-                status = "Orçamento"
-            return {
-                "id": item.id,
-                "cliente": item.cliente.nome,
-                "descricao": f"{item.tamanho_cm} cm",
-                "status_display": status,
-                "foi_impresso": item.foi_impresso,
-                "foi_entregue": item.foi_entregue,
-                "esta_pago": item.esta_pago,
-                "data_criacao": item.data_criacao.isoformat(),
-            }
-
-        def serialize_urgente(obj, tipo):
-            return {
-                "id": obj.id,
-                "tipo": tipo,
-                "cliente": obj.cliente.nome if obj.cliente else "",
-                "descricao": getattr(obj, "tamanho_cm", ""),
-                "foi_impresso": getattr(obj, "foi_impresso", None),
-                "foi_entregue": getattr(obj, "foi_entregue", None),
-                "data_criacao": obj.data_criacao.isoformat(),
-            }
-
-        # ===========================
-        # PEDIDO FABRICA
-        # ===========================
-
-        pf_total = PedidoFabrica.objects.filter(
-            data_criacao__gte=hoje_start,
-            data_criacao__lt=amanha_start
-        ).count()
-
-        pf_pendente = PedidoFabrica.objects.filter(
-            status="pendente",
-            data_criacao__gte=hoje_start,
-            data_criacao__lt=amanha_start
-        ).count()
-
-        pf_em_producao = PedidoFabrica.objects.filter(
-            status="em_producao",
-            data_criacao__gte=hoje_start,
-            data_criacao__lt=amanha_start
-        ).count()
-
-        pf_finalizado = PedidoFabrica.objects.filter(
-            status="finalizado",
-            data_criacao__gte=hoje_start,
-            data_criacao__lt=amanha_start
-        ).count()
-
-        pf_urgentes = PedidoFabrica.objects.filter(
-            status="pendente",
-            data_criacao__lt=dois_dias_atras
-        ).select_related("cliente").order_by("data_criacao")[:10]
-
-        return Response({
-            "dtf": {
-                "total": dtf_hoje.count(),
-
-                "pagos": dtf_pagos.count(),
-
-                "fila": dtf_fila.count(),
-                "fila_list": [
-                    serialize_dtf(i)
-                    for i in dtf_fila
-                ],
-
-                "prontos_entrega": dtf_prontos.count(),
-                "prontos_entrega_list": [
-                    serialize_dtf(i)
-                    for i in dtf_prontos
-                ],
-
-                "entregues": dtf_entregues.count(),
-
-                "urgentes": [
-                    serialize_urgente(i, "DTF")
-                    for i in dtf_urgentes
-                ]
-            },
-
-            "pedido_fabrica": {
-                "total": pf_total,
-                "pendente": pf_pendente,
-                "em_producao": pf_em_producao,
-                "finalizado": pf_finalizado,
-
-                "urgentes": [
-                    serialize_urgente(i, "FABRICA")
-                    for i in pf_urgentes
-                ]
-            }
-        })
-        
 class SyncDTFStatusView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        from api.models import DTFVendor
-        dtfs = DTFVendor.objects.all()
-        atualizados = 0
-        for dtf in dtfs:
-            old_status = dtf.status
-            dtf.atualizar_status()
-            if dtf.status != old_status:
-                dtf.save(update_fields=['status'])
-                atualizados += 1
-        return Response({'ok': True, 'total': dtfs.count(), 'atualizados': atualizados})
+        total, atualizados = StatusService.sincronizar_dtf()
+        return Response({'ok': True, 'total': total, 'atualizados': atualizados})
 
 class DashboardStatsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        hoje = timezone.now()
+        hoje = timezone.localdate()
+        return Response(ReportCache.get_or_build(
+            'dashboard', hoje.year, lambda: self.calcular(hoje), totais=True, month=hoje.month))
 
-        total_orcamentos = Orcamento.objects.filter(
-            data_criacao__month=hoje.month,
-            data_criacao__year=hoje.year
-        ).count()
+    @staticmethod
+    def calcular(hoje):
+        stats = DashboardService.get_stats()
 
-        query_financeira = DTFVendor.objects.filter(
-            data_criacao__month=hoje.month,
-            data_criacao__year=hoje.year
-        )
-        total_vendas_dtf_valor = sum(i.valor_total() for i in query_financeira)
+        dtf_mes = ReportService.get_dtf_mes(hoje.year, hoje.month)
 
-        total_metragem = sum(i.tamanho_cm for i in query_financeira)
-        total_vendas_dtf = len(query_financeira)
+        total_vendas_dtf_valor = dtf_mes['valor_total']
+        total_metragem = dtf_mes['tamanho_cm']
+        total_vendas_dtf = dtf_mes['total_pedidos']
 
-        return Response({
-            'total_orcamento': total_orcamentos,
+        return {
+            'total_orcamento': stats['orcamentos']['total_mes'],
             'total_dtf_valor': total_vendas_dtf_valor,
             'total_vendas_dtf': total_vendas_dtf,
             'metragem_dtf': total_metragem,
-        })
+            **stats,
+        }
+
+
+class ReportCacheStatsView(APIView):
+    """
+    GET /api/reports/cache-stats/
+    Contadores de hit/miss do cache de relatórios.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(ReportCache.stats())
+
+
+class ImageProfileStatsView(APIView):
+    """
+    GET /api/reports/image-profiles/
+    Perfis de imagem em uso e quantos bytes cada um economizou.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(ImagePipelineService.stats())
+
+
+class ThumbnailView(APIView):
+    """
+    GET /api/media/thumb/<tamanho>/<caminho>
+    Miniatura WebP de um arquivo de /media/ para as listagens.
+    Pública como o próprio /media/ (a tag <img> não envia o token).
+    """
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+
+    def get(self, request, tamanho, caminho):
+        from django.core.exceptions import SuspiciousFileOperation
+        from django.http import FileResponse, HttpResponse, Http404
+        from django.utils.http import http_date, parse_etags
+        if tamanho not in THUMB_TAMANHOS:
+            raise Http404
+        try:
+            chave, _, modificado = ThumbCache.chave(caminho, tamanho)
+            if chave is None:
+                raise Http404
+            etag = f'"{chave}"'
+            # O upload_to reaproveita o nome ao trocar o arquivo: o navegador
+            # sempre revalida, e a resposta é 304 enquanto o original não muda
+            if etag in parse_etags(request.headers.get('If-None-Match', '')):
+                response = HttpResponse(status=304)
+            else:
+                arquivo, chave = ThumbCache.abrir(caminho, tamanho)
+                response = FileResponse(arquivo, content_type='image/webp')
+        except (FileNotFoundError, SuspiciousFileOperation):
+            raise Http404
+        except ImagemOcupada as e:
+            response = Response({'error': str(e)}, status=503)
+            response['Retry-After'] = '5'
+            return response
+
+        response['ETag'] = f'"{chave}"'
+        response['Last-Modified'] = http_date(modificado)
+        response['Cache-Control'] = 'public, no-cache'
+        return response
 
 
 class ReportsView(APIView):
@@ -434,133 +353,10 @@ class ReportsView(APIView):
         """
         year = int(request.query_params.get('year', timezone.now().year))
         month_param = request.query_params.get('month')
+        month = int(month_param) if month_param else None
 
-        def mes_range():
-            if month_param:
-                return [int(month_param)]
-            return range(1, 13)
-
-        dtf_monthly = []
-        dtf_by_type_monthly = []
-        pedido_monthly = []
-        revenue_received_monthly = []
-
-        for m in mes_range():
-            # --- DTF: agregado geral (sem misturar unidades diferentes) ---
-            qs_dtf = DTFVendor.objects.filter(data_criacao__year=year, data_criacao__month=m)
-            total_valor = sum(row.valor_total() for row in qs_dtf)
-            dtf_monthly.append({
-                'mes': m,
-                'total_pedidos': qs_dtf.count(),
-                'total_revenue': float(total_valor),
-            })
-
-            # --- DTF por tipo (com unidades corretas) ---
-            for tipo_val, tipo_label in DTFVendor.TIPOS_PRODUTO:
-                qs_t = qs_dtf.filter(tipo_produto=tipo_val)
-                if not qs_t.exists():
-                    continue
-                if tipo_val == 'estampa':
-                    # Estampa: quantidade de unidades
-                    total_un = sum(row.quantidade or 1 for row in qs_t)
-                    dtf_by_type_monthly.append({
-                        'mes': m,
-                        'tipo': tipo_val,
-                        'tipo_display': tipo_label,
-                        'total_pedidos': qs_t.count(),
-                        'total_revenue': float(sum(row.valor_total() for row in qs_t)),
-                        'quantidade': round(total_un, 2),
-                        'unidade': 'un',
-                    })
-                elif tipo_val == 'sublimacao':
-                    # Sublimação: tamanho_cm = cm² → converter para m²
-                    total_cm2 = sum(row.tamanho_cm for row in qs_t)
-                    dtf_by_type_monthly.append({
-                        'mes': m,
-                        'tipo': tipo_val,
-                        'tipo_display': tipo_label,
-                        'total_pedidos': qs_t.count(),
-                        'total_revenue': float(sum(row.valor_total() for row in qs_t)),
-                        'quantidade': round(float(total_cm2 / Decimal('10000')), 2),
-                        'unidade': 'm²',
-                    })
-                else:
-                    # DTF Têxtil/UV: tamanho_cm = cm lineares → metros
-                    total_cm = sum(row.tamanho_cm for row in qs_t)
-                    dtf_by_type_monthly.append({
-                        'mes': m,
-                        'tipo': tipo_val,
-                        'tipo_display': tipo_label,
-                        'total_pedidos': qs_t.count(),
-                        'total_revenue': float(sum(row.valor_total() for row in qs_t)),
-                        'quantidade': round(float(total_cm / Decimal('100')), 2),
-                        'unidade': 'm',
-                    })
-
-            # --- DTF pago (receita recebida) ---
-            qs_pago = DTFVendor.objects.filter(data_criacao__year=year, data_criacao__month=m, esta_pago=True)
-            total_recebido = sum(row.valor_total() for row in qs_pago)
-            revenue_received_monthly.append({
-                'mes': m,
-                'total_pedidos': qs_pago.count(),
-                'total_recebido': float(total_recebido),
-            })
-
-            # --- PedidoFabrica ---
-            qs_ped = PedidoFabrica.objects.filter(data_criacao__year=year, data_criacao__month=m)
-            total_pecas = sum(p.total_itens() for p in qs_ped)
-            pedido_monthly.append({
-                'mes': m,
-                'total_pedidos': qs_ped.count(),
-                'total_pecas': total_pecas,
-            })
-
-        # --- DTF por tipo (ano todo, para cards da tabela) ---
-        base_dtf_ano = DTFVendor.objects.filter(data_criacao__year=year)
-        dtf_by_type = []
-        for tipo_val, tipo_label in DTFVendor.TIPOS_PRODUTO:
-            qs_t = base_dtf_ano.filter(tipo_produto=tipo_val)
-            if not qs_t.exists():
-                continue
-            if tipo_val == 'estampa':
-                total_un = sum(row.quantidade or 1 for row in qs_t)
-                dtf_by_type.append({
-                    'tipo': tipo_val,
-                    'tipo_display': tipo_label,
-                    'total_pedidos': qs_t.count(),
-                    'total_revenue': float(sum(row.valor_total() for row in qs_t)),
-                    'quantidade': round(total_un, 2),
-                    'unidade': 'un',
-                })
-            elif tipo_val == 'sublimacao':
-                total_cm2 = sum(row.tamanho_cm for row in qs_t)
-                dtf_by_type.append({
-                    'tipo': tipo_val,
-                    'tipo_display': tipo_label,
-                    'total_pedidos': qs_t.count(),
-                    'total_revenue': float(sum(row.valor_total() for row in qs_t)),
-                    'quantidade': round(float(total_cm2 / Decimal('10000')), 2),
-                    'unidade': 'm²',
-                })
-            else:
-                total_cm = sum(row.tamanho_cm for row in qs_t)
-                dtf_by_type.append({
-                    'tipo': tipo_val,
-                    'tipo_display': tipo_label,
-                    'total_pedidos': qs_t.count(),
-                    'total_revenue': float(sum(row.valor_total() for row in qs_t)),
-                    'quantidade': round(float(total_cm / Decimal('100')), 2),
-                    'unidade': 'm',
-                })
-
-        return Response({
-            'year': year,
-            'dtf_monthly': dtf_monthly,
-            'dtf_by_type': dtf_by_type,
-            'dtf_by_type_monthly': dtf_by_type_monthly,
-            'pedido_monthly': pedido_monthly,
-            'revenue_received_monthly': revenue_received_monthly,
-        })
+        return Response(ReportCache.get_or_build(
+            'monthly', year, lambda: ReportService.get_monthly(year, month), month=month))
 
 
 class ClientReportView(APIView):
@@ -574,93 +370,71 @@ class ClientReportView(APIView):
         year = int(request.query_params.get('year', timezone.now().year))
         limit = int(request.query_params.get('limit', 20))
 
-        clients = Cliente.objects.filter(
-            dtfvendor__data_criacao__year=year
-        ).distinct().order_by('-dtfvendor__data_criacao')[:limit * 2]
-
-        # ranking manual por receita
-        client_revenue = {}
-        for d in DTFVendor.objects.filter(data_criacao__year=year).select_related('cliente'):
-            cid = d.cliente_id
-            if cid not in client_revenue:
-                client_revenue[cid] = {'cliente': d.cliente, 'total_revenue': 0, 'total_pedidos': 0}
-            client_revenue[cid]['total_revenue'] += d.valor_total()
-            client_revenue[cid]['total_pedidos'] += 1
-
-        sorted_clients = sorted(client_revenue.values(), key=lambda x: x['total_revenue'], reverse=True)[:limit]
-
-        result = []
-        for item in sorted_clients:
-            c = item['cliente']
-            dtf_orders = DTFVendor.objects.filter(cliente=c, data_criacao__year=year)
-            metros_lineares = sum(
-                row.tamanho_cm / Decimal('100')
-                for row in dtf_orders.filter(tipo_produto__in=['dtf_textil', 'dtf_uv'])
-            )
-            metros_quadrados = sum(
-                row.tamanho_cm / Decimal('10000')
-                for row in dtf_orders.filter(tipo_produto='sublimacao')
-            )
-            unidades_estampa = sum(
-                row.quantidade or 1
-                for row in dtf_orders.filter(tipo_produto='estampa')
-            )
-            result.append({
-                'cliente_id': c.id,
-                'cliente_nome': c.nome,
-                'total_pedidos': item['total_pedidos'],
-                'total_revenue': float(item['total_revenue']),
-                'metros_lineares': round(float(metros_lineares), 2),
-                'metros_quadrados': round(float(metros_quadrados), 2),
-                'unidades_estampa': unidades_estampa,
-            })
-
-        return Response({'year': year, 'clients': result})
+        return Response(ReportCache.get_or_build(
+            'clients', year,
+            lambda: {'year': year, 'clients': ReportService.get_clients(year, limit)},
+            limit=limit))
 
 
 class DTFOrdersReportView(APIView):
     """
     GET /api/reports/dtf-orders/?year=2026&month=6
     Lista todos os pedidos DTF de um mês específico com detalhes completos.
+
+    Com ?format=csv|xlsx|ndjson exporta em streaming; sem `month` exporta o ano todo.
     """
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, CSVRenderer, XLSXRenderer, NDJSONRenderer]
+    colunas = [
+        'id', 'cliente_nome', 'tipo_produto', 'tipo_display', 'quantidade', 'unidade',
+        'valor_total', 'status', 'data_criacao', 'preco_unit_override', 'tamanho_cm',
+    ]
+
+    @staticmethod
+    def serializar(d):
+        cliente_nome = d.cliente.nome if d.cliente else '—'
+        tipo_display = dict(DTFVendor.TIPOS_PRODUTO).get(d.tipo_produto, d.tipo_produto)
+        # Calcular quantidade/unidade conforme tipo
+        if d.tipo_produto == 'estampa':
+            qtd = d.quantidade or 1
+            unidade = 'un'
+        elif d.tipo_produto == 'sublimacao':
+            qtd = round(float(d.tamanho_cm / Decimal('10000')), 2)
+            unidade = 'm²'
+        else:
+            qtd = round(float(d.tamanho_cm / Decimal('100')), 2)
+            unidade = 'm'
+        return {
+            'id': d.id,
+            'cliente_nome': cliente_nome,
+            'tipo_produto': d.tipo_produto,
+            'tipo_display': tipo_display,
+            'quantidade': qtd,
+            'unidade': unidade,
+            'valor_total': float(d.valor_total or 0),
+            'status': d.status,
+            'data_criacao': d.data_criacao.strftime('%d/%m/%Y'),
+            'preco_unit_override': d.preco_unit_override,
+            'tamanho_cm': d.tamanho_cm,
+        }
 
     def get(self, request):
         year = int(request.query_params.get('year', timezone.now().year))
-        month = int(request.query_params.get('month', timezone.now().month))
-
-        qs = DTFVendor.objects.filter(
-            data_criacao__year=year, data_criacao__month=month
-        ).select_related('cliente').order_by('-data_criacao')
-
-        orders = []
-        for d in qs:
-            cliente_nome = d.cliente.nome if d.cliente else '—'
-            tipo_display = dict(DTFVendor.TIPOS_PRODUTO).get(d.tipo_produto, d.tipo_produto)
-            # Calcular quantidade/unidade conforme tipo
-            if d.tipo_produto == 'estampa':
-                qtd = d.quantidade or 1
-                unidade = 'un'
-            elif d.tipo_produto == 'sublimacao':
-                qtd = round(float(d.tamanho_cm / Decimal('10000')), 2)
-                unidade = 'm²'
-            else:
-                qtd = round(float(d.tamanho_cm / Decimal('100')), 2)
-                unidade = 'm'
-            orders.append({
-                'id': d.id,
-                'cliente_nome': cliente_nome,
-                'tipo_produto': d.tipo_produto,
-                'tipo_display': tipo_display,
-                'quantidade': qtd,
-                'unidade': unidade,
-                'valor_total': float(d.valor_total()),
-                'status': d.status,
-                'data_criacao': d.data_criacao.strftime('%d/%m/%Y'),
-                'preco_unit_override': d.preco_unit_override,
-                'tamanho_cm': d.tamanho_cm,
-            })
+        formato = request.accepted_renderer.format
+        exportar = formato in ExportService.FORMATOS
+        month_param = request.query_params.get('month')
+        month = int(month_param) if month_param else (None if exportar else timezone.now().month)
 
+        qs = DTFVendor.objects.filter(data_criacao__year=year)
+        if month:
+            qs = qs.filter(data_criacao__month=month)
+        qs = qs.select_related('cliente').order_by('-data_criacao')
+
+        if exportar:
+            nome = f'pedidos-dtf-{year}' + (f'-{month:02d}' if month else '')
+            return ExportService.export(formato, qs, self.serializar, self.colunas, nome)
+
+        orders = [self.serializar(d) for d in qs]
         return Response({'year': year, 'month': month, 'orders': orders, 'total': len(orders)})
 
 
@@ -668,40 +442,56 @@ class FabricaOrdersReportView(APIView):
     """
     GET /api/reports/fabrica-orders/?year=2026&month=6
     Lista todos os pedidos fábrica de um mês específico com detalhes completos.
+
+    Com ?format=csv|xlsx|ndjson exporta em streaming; sem `month` exporta o ano todo.
     """
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, CSVRenderer, XLSXRenderer, NDJSONRenderer]
+    colunas = [
+        'id', 'cliente_nome', 'status', 'status_display', 'total_pecas',
+        'valor_total', 'data_criacao', 'detalhes_tamanho',
+    ]
+
+    @staticmethod
+    def serializar(p):
+        detalhes = p.detalhes_tamanho
+        # detalhes_tamanho é um JSONField com formato: {"P": 10, "M": 20, "G": 15} ou similar
+        total_pecas = 0
+        if isinstance(detalhes, dict):
+            total_pecas = sum(int(v) for v in detalhes.values() if str(v).isdigit())
+        elif isinstance(detalhes, list):
+            total_pecas = sum(int(item.get('quantidade', 0)) for item in detalhes if isinstance(item, dict))
+
+        cliente_nome = p.cliente.nome if p.cliente else '—'
+        status_display = p.get_status_display() if hasattr(p, 'get_status_display') else p.status
+        return {
+            'id': p.id,
+            'cliente_nome': cliente_nome,
+            'status': p.status,
+            'status_display': status_display,
+            'total_pecas': total_pecas,
+            'valor_total': float(p.total_itens()),
+            'data_criacao': p.data_criacao.strftime('%d/%m/%Y') if p.data_criacao else '—',
+            'detalhes_tamanho': json.dumps(detalhes) if detalhes else '',
+        }
 
     def get(self, request):
         year = int(request.query_params.get('year', timezone.now().year))
-        month = int(request.query_params.get('month', timezone.now().month))
-
-        qs = PedidoFabrica.objects.filter(
-            data_criacao__year=year, data_criacao__month=month
-        ).select_related('cliente').order_by('-data_criacao')
-
-        orders = []
-        for p in qs:
-            detalhes = p.detalhes_tamanho
-            # detalhes_tamanho é um JSONField com formato: {"P": 10, "M": 20, "G": 15} ou similar
-            total_pecas = 0
-            if isinstance(detalhes, dict):
-                total_pecas = sum(int(v) for v in detalhes.values() if str(v).isdigit())
-            elif isinstance(detalhes, list):
-                total_pecas = sum(int(item.get('quantidade', 0)) for item in detalhes if isinstance(item, dict))
-
-            cliente_nome = p.cliente.nome if p.cliente else '—'
-            status_display = p.get_status_display() if hasattr(p, 'get_status_display') else p.status
-            orders.append({
-                'id': p.id,
-                'cliente_nome': cliente_nome,
-                'status': p.status,
-                'status_display': status_display,
-                'total_pecas': total_pecas,
-                'valor_total': float(p.total_itens()),
-                'data_criacao': p.data_criacao.strftime('%d/%m/%Y') if p.data_criacao else '—',
-                'detalhes_tamanho': json.dumps(detalhes) if detalhes else '',
-            })
+        formato = request.accepted_renderer.format
+        exportar = formato in ExportService.FORMATOS
+        month_param = request.query_params.get('month')
+        month = int(month_param) if month_param else (None if exportar else timezone.now().month)
+
+        qs = PedidoFabrica.objects.filter(data_criacao__year=year)
+        if month:
+            qs = qs.filter(data_criacao__month=month)
+        qs = qs.select_related('cliente').order_by('-data_criacao')
 
+        if exportar:
+            nome = f'pedidos-fabrica-{year}' + (f'-{month:02d}' if month else '')
+            return ExportService.export(formato, qs, self.serializar, self.colunas, nome)
+
+        orders = [self.serializar(p) for p in qs]
         return Response({'year': year, 'month': month, 'orders': orders, 'total': len(orders)})
 
 
@@ -721,10 +511,11 @@ class ChangePasswordView(APIView):
         return Response({"message": "Senha alterada com sucesso"}, status=status.HTTP_200_OK)
 
 
-class PedidoFabricaViewSet(viewsets.ModelViewSet):
+class PedidoFabricaViewSet(ImpressaoLoteMixin, viewsets.ModelViewSet):
     queryset = PedidoFabrica.objects.all().order_by('-data_criacao')
     serializer_class = PedidoFabricaSerializer
     permission_classes = [permissions.IsAuthenticated]
+    tipo_pdf_job = 'pedido'
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status']
     search_fields = ['cliente__nome', 'detalhes_tamanho']
@@ -740,59 +531,71 @@ class PedidoFabricaViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def gerar_pdf(self, request, pk=None):
-        pedido = self.get_object()
-        # Adicionando o valor por extenso
-
-        logo_path = os.path.join(
-            settings.BASE_DIR, 'static', 'logo-printcollor.png')
-        ordem_tamanhos = ["pp", "p", "m", "g", "gg", "xgg", "xxgg"]
-        ordem_bl = ["bl pp", "bl p", "bl m",
-                    "bl g", "bl gg", "bl xgg", "bl xxgg"]
-
-        detalhes = {k.lower(): v for k, v in pedido.detalhes_tamanho.items()}
-
-        grade_adulto = [
-            {"tamanho": t, "qtd": detalhes[t]}
-            for t in ordem_tamanhos
-            if detalhes.get(t, 0) > 0
-        ]
-
-        grade_bl = [
-            {"tamanho": t, "qtd": detalhes[t]}
-            for t in ordem_bl
-            if detalhes.get(t, 0) > 0
-        ]
-
-        grade_inf = [
-            {"tamanho": t, "qtd": q}
-            for t, q in detalhes.items()
-            if q > 0 and ("a" in t or "anos" in t)
-        ]
-
-        grade_outros = [
-            {"tamanho": t, "qtd": q}
-            for t, q in detalhes.items()
-            if q > 0
-            and t not in ordem_tamanhos
-            and t not in ordem_bl
-            and not ("a" in t or "anos" in t)
-        ]
-
-        context = {
-            'pedido': pedido,
-            'logo_url': f'file://{logo_path}',
-            'layout_url': f'file://{pedido.layout.path}' if pedido.layout else None,
-            'total': pedido.total_itens(),
-            'grade_adulto': grade_adulto,
-            'grade_bl': grade_bl,
-            'grade_inf': grade_inf,
-            'grade_outros': grade_outros,
-            'now': timezone.now(),
-        }
+        doc = PDFService.documento_pedido(self.get_object())
+        return gerar_pdf_from_html(doc.template, doc.context, doc.filename,
+                                   request=request, volateis=doc.volateis)
+
+    @action(detail=False, methods=['get', 'post'])
+    def imprimir_lote(self, request):
+        """
+        Fichas de vários pedidos num PDF só (ou ?formato=zip, ou ?async=true para um PDFJob).
+        Ex.: ?status=em_producao&hoje=true
+        """
+        return self.responder_lote(request, PDFService.documento_pedido, 'pedidos')
 
-        name = f'pedido-{pedido.cliente.nome}-{pedido.id}'
 
-        return gerar_pdf_from_html('pdfs/pedido.html', context, f'{name}.pdf')
+class PDFJobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    PDFs gerados em segundo plano (lotes grandes, orçamentos pesados):
+    POST cria o job (202), GET /<id>/ devolve status e progresso e
+    GET /<id>/download/ entrega o arquivo quando concluído.
+    """
+    queryset = PDFJob.objects.all()
+    serializer_class = PDFJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        # Cada usuário só acompanha os próprios jobs (admin vê todos)
+        qs = super().get_queryset()
+        if self.request.user.is_staff:
+            return qs
+        return qs.filter(usuario=self.request.user)
+
+    @staticmethod
+    def resposta_criado(job, request):
+        data = PDFJobSerializer(job, context={'request': request}).data
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={'Location': data['status_url']})
+
+    # Viewset de onde vêm os PDFs de cada tipo: o job exige as mesmas permissões
+    VIEWSETS_ORIGEM = {
+        'dtf': DTFVendorViewSet,
+        'pedido': PedidoFabricaViewSet,
+        'orcamento': OrcamentoViewSet,
+    }
+
+    def checar_permissao_tipo(self, request, tipo):
+        origem = self.VIEWSETS_ORIGEM[tipo](
+            request=request, action='gerar_pdf', args=(), kwargs={}, format_kwarg=None)
+        origem.check_permissions(request)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.checar_permissao_tipo(request, serializer.validated_data['tipo'])
+        job = PDFJobService.criar(request.user, serializer.validated_data['tipo'], serializer.validated_data['ids'])
+        return self.resposta_criado(job, request)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        from django.http import FileResponse
+        job = self.get_object()
+        if job.status != 'concluido':
+            return Response(PDFJobSerializer(job, context={'request': request}).data, status=409)
+        try:
+            arquivo = open(job.arquivo, 'rb')
+        except (OSError, TypeError):
+            return Response({'error': 'Arquivo expirado, gere o PDF novamente.'}, status=410)
+        return FileResponse(arquivo, as_attachment=True, content_type='application/pdf', filename=job.nome_arquivo)
 
 
 class BackupExportView(APIView):
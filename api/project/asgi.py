@@ -23,3 +23,7 @@ application = ProtocolTypeRouter({
         )
     ),
 })
+
+# Sobe os workers de PDF já aquecidos (CSS/fontes carregados) sem bloquear o start
+from api.tools.pdf_pool import PDFPool  # noqa: E402
+PDFPool.aquecer()
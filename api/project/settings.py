@@ -86,6 +86,54 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Cache (versões/respostas dos relatórios, mapa de renomeação e contadores do
+# pipeline de imagens). O padrão em arquivo é compartilhado entre os workers do
+# mesmo host, mas o incr dele não é atômico e o descarte ao passar de
+# MAX_ENTRIES é aleatório; em produção use Redis (incr atômico).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'django')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 100000)),
+        },
+    }
+}
+REPORT_CACHE_TIMEOUT = int(os.getenv('REPORT_CACHE_TIMEOUT', 300))  # segundos (ano corrente)
+REPORT_CACHE_TIMEOUT_FECHADO = int(os.getenv('REPORT_CACHE_TIMEOUT_FECHADO', 86400))  # anos fechados
+PRICING_CACHE_CHECK_INTERVAL = int(os.getenv('PRICING_CACHE_CHECK_INTERVAL', 5))  # segundos
+
+# Renderização de PDF (WeasyPrint) em pool de processos. PDF_WORKERS=0 renderiza no próprio processo
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', 2))
+PDF_QUEUE_LIMIT = int(os.getenv('PDF_QUEUE_LIMIT', 8))  # além dos que estão renderizando -> 503
+PDF_TIMEOUT = int(os.getenv('PDF_TIMEOUT', 60))  # segundos -> 504
+PDF_MAX_TASKS_PER_CHILD = int(os.getenv('PDF_MAX_TASKS_PER_CHILD', 100))  # recicla o worker
+PDF_BATCH_LIMIT = int(os.getenv('PDF_BATCH_LIMIT', 100))  # pedidos por impressão em lote
+PDF_WARMUP = os.getenv('PDF_WARMUP', 'True') == 'True'  # sobe e aquece os workers no start do ASGI
+PDF_IMAGE_DPI = int(os.getenv('PDF_IMAGE_DPI', 200))  # resolução das imagens embutidas nos PDFs
+# Cache em disco dos PDFs (chave = hash do HTML + arquivos embutidos). 0 desativa
+PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'pdf'))
+PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_MB', 500)) * 1024 * 1024
+# Jobs de PDF em segundo plano (/api/pdf-jobs/): arquivos ficam PDF_JOB_TTL segundos
+PDF_JOBS_DIR = os.getenv('PDF_JOBS_DIR', os.path.join(BASE_DIR, 'cache', 'pdf_jobs'))
+PDF_JOB_TTL = int(os.getenv('PDF_JOB_TTL', 3600))
+PDF_JOB_TIMEOUT = int(os.getenv('PDF_JOB_TIMEOUT', 600))  # segundos por job
+# Pré-render da folha quando o DTF fica pago / o pedido entra em produção (só com worker livre)
+PDF_PRERENDER = os.getenv('PDF_PRERENDER', 'True') == 'True'
+PDF_PRERENDER_MAX = int(os.getenv('PDF_PRERENDER_MAX', 1))  # pré-renders simultâneos (< PDF_WORKERS)
+# Uploads de layout/comprovante são comprimidos em segundo plano depois de salvos
+IMAGE_PIPELINE = os.getenv('IMAGE_PIPELINE', 'True') == 'True'
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 1))
+# Ajustes dos perfis de imagem, ex.: {'comprovante': {'max_width': 1600, 'modo': None}}
+IMAGE_PROFILES = {}
+# Decodificação de imagens: maior imagem aceita e memória para as decodificadas ao mesmo tempo
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_MP', 250)) * 1_000_000
+IMAGE_DECODE_BUDGET_MB = int(os.getenv('IMAGE_DECODE_BUDGET_MB', 512))
+IMAGE_DECODE_TIMEOUT = int(os.getenv('IMAGE_DECODE_TIMEOUT', 60))  # segundos esperando memória -> 503
+# Miniaturas WebP das listagens (/api/media/thumb/<tamanho>/<caminho>)
+THUMB_CACHE_DIR = os.getenv('THUMB_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'thumbs'))
+THUMB_CACHE_MAX_BYTES = int(os.getenv('THUMB_CACHE_MAX_MB', 200)) * 1024 * 1024
+
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
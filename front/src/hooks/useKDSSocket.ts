@@ -0,0 +1,137 @@
+import { useEffect, useRef, useCallback, useState } from 'react';
+import axios from 'axios';
+
+export interface KDSEstado {
+  hoje: boolean;
+  bucket: string | null;
+  urgente: boolean;
+}
+
+export interface KDSDelta {
+  type: 'delta';
+  modelo: 'dtf' | 'pedido_fabrica';
+  id: number;
+  antes: KDSEstado | null;
+  depois: KDSEstado | null;
+  item?: any;
+  urgente?: any;
+}
+
+export interface KDSSnapshot {
+  type: 'snapshot';
+  data: any;
+}
+
+export type KDSMensagem = KDSSnapshot | KDSDelta;
+
+/** Monta a URL do WebSocket a partir do VITE_API_URL (mesma regra do chat do WhatsApp). */
+export function wsUrl(path: string) {
+  const apiUrl = import.meta.env.VITE_API_URL || '';
+  let wsBase = apiUrl;
+  if (!wsBase) {
+    wsBase = `${window.location.protocol === 'https:' ? 'wss:' : 'ws:'}//${window.location.host}/`;
+  } else {
+    wsBase = wsBase.replace(/^http:/, 'ws:').replace(/^https:/, 'wss:').replace('api/', '');
+  }
+  const token = localStorage.getItem('access_token') || '';
+  return `${wsBase}${path}?token=${encodeURIComponent(token)}`;
+}
+
+/**
+ * O painel não faz chamadas HTTP, então o interceptor do axios nunca renova o token.
+ * Renova aqui (mesma regra do interceptor) quando o socket fecha com 4001.
+ */
+async function renovarToken() {
+  const refreshToken = localStorage.getItem('refresh_token');
+  if (!refreshToken) {
+    window.location.href = '/login';
+    return false;
+  }
+  try {
+    const { data } = await axios.post(`${import.meta.env.VITE_API_URL}token/refresh/`, {
+      refresh: refreshToken,
+    });
+    localStorage.setItem('access_token', data.access);
+    return true;
+  } catch (err: any) {
+    // Sem resposta (rede/servidor fora): mantém o token e tenta de novo no próximo ciclo
+    if (!err?.response) return true;
+    localStorage.clear();
+    window.location.href = '/login';
+    return false;
+  }
+}
+
+/**
+ * Conexão com ws/kds/: recebe o snapshot ao conectar e depois só deltas.
+ * Reconecta sozinho (com backoff) e pede um snapshot novo na virada do dia.
+ */
+export function useKDSSocket(onMessage: (msg: KDSMensagem) => void) {
+  const [conectado, setConectado] = useState(false);
+  const wsRef = useRef<WebSocket | null>(null);
+  const handlerRef = useRef(onMessage);
+  handlerRef.current = onMessage;
+
+  const pedirSnapshot = useCallback(() => {
+    if (wsRef.current?.readyState === WebSocket.OPEN) {
+      wsRef.current.send(JSON.stringify({ type: 'snapshot' }));
+    }
+  }, []);
+
+  useEffect(() => {
+    let ativo = true;
+    let tentativas = 0;
+    let reconectarTimer: ReturnType<typeof setTimeout> | null = null;
+
+    const conectar = () => {
+      const ws = new WebSocket(wsUrl('ws/kds/'));
+      wsRef.current = ws;
+
+      ws.onopen = () => {
+        tentativas = 0;
+        setConectado(true);
+      };
+
+      ws.onmessage = (event) => {
+        try {
+          handlerRef.current(JSON.parse(event.data));
+        } catch (err) {
+          console.error('[WS KDS] Erro ao processar mensagem:', err);
+        }
+      };
+
+      ws.onclose = async (event) => {
+        setConectado(false);
+        if (!ativo) return;
+        // 4001: token expirado/inválido (consumer fecha antes de aceitar)
+        if (event.code === 4001 && !(await renovarToken())) return;
+        if (!ativo) return;
+        const espera = Math.min(30000, 1000 * 2 ** tentativas++);
+        reconectarTimer = setTimeout(conectar, espera);
+      };
+    };
+
+    conectar();
+
+    // Virada do dia: as contagens "de hoje" zeram
+    let viradaTimer: ReturnType<typeof setTimeout>;
+    const agendarVirada = () => {
+      const agora = new Date();
+      const meiaNoite = new Date(agora.getFullYear(), agora.getMonth(), agora.getDate() + 1, 0, 0, 5);
+      viradaTimer = setTimeout(() => {
+        pedirSnapshot();
+        agendarVirada();
+      }, meiaNoite.getTime() - agora.getTime());
+    };
+    agendarVirada();
+
+    return () => {
+      ativo = false;
+      if (reconectarTimer) clearTimeout(reconectarTimer);
+      clearTimeout(viradaTimer);
+      wsRef.current?.close();
+    };
+  }, [pedirSnapshot]);
+
+  return { conectado, pedirSnapshot };
+}
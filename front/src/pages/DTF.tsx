@@ -21,6 +21,7 @@ import { TriStateFilter } from '../components/TriStateFilter';
 import { useAlert } from '../contexts/AlertContext';
 import { buildPixBRCode } from '../utils/pix';
 import { usePaginatedList } from '../hooks/usePaginatedList';
+import { thumbUrl, usarOriginal } from '../tools/thumbUrl';
 
 // Endereço da loja (constante — mover para Configuracoes quando virar configurável)
 const LOJA_ENDERECO = {
@@ -428,7 +429,9 @@ export const DTFTable = () => {
             {item.layout_arquivo && (
               <div className="mb-4 rounded-2xl overflow-hidden border border-slate-100 bg-slate-50">
                 <img
-                  src={item.layout_arquivo}
+                  src={thumbUrl(item.layout_arquivo, 320)}
+                  onError={usarOriginal(item.layout_arquivo)}
+                  loading="lazy"
                   alt="Layout"
                   className="w-full h-32 object-contain"
                 />
@@ -1,5 +1,6 @@
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useRef } from 'react';
 import { api } from '../auth/useAuth';
+import { useKDSSocket, type KDSDelta, type KDSMensagem } from '../hooks/useKDSSocket';
 import { RefreshCw, AlertTriangle, Eye, Printer, Truck, Clock } from 'lucide-react';
 
 interface KDSPanel {
@@ -10,7 +11,7 @@ interface KDSPanel {
     fila_list: DTFListItem[];
     prontos_entrega: number;
     prontos_entrega_list: DTFListItem[];
-    entregue: number;
+    entregues: number;
     urgentes: UrgenteItem[];
   };
   pedido_fabrica: {
@@ -48,31 +49,77 @@ function diasAtras(iso: string) {
   return Math.floor(diff / 86400000);
 }
 
+const LIMITE_URGENTES = 10;
+
+const porData = (a: { data_criacao: string }, b: { data_criacao: string }) =>
+  a.data_criacao.localeCompare(b.data_criacao);
+
+/** Aplica um delta do ws/kds/ no painel. Retorna também se precisa de snapshot novo. */
+function aplicarDelta(painel: KDSPanel, delta: KDSDelta): [KDSPanel, boolean] {
+  const { antes, depois } = delta;
+  const ajustar = (contagens: Record<string, any>, sinal: number, estado: typeof antes) => {
+    if (!estado?.hoje) return;
+    contagens.total += sinal;
+    if (estado.bucket && estado.bucket in contagens) contagens[estado.bucket] += sinal;
+    if (delta.modelo === 'dtf' && estado.bucket) contagens.pagos += sinal;
+  };
+
+  const atualizarUrgentes = (urgentes: UrgenteItem[]): [UrgenteItem[], boolean] => {
+    const restantes = urgentes.filter(u => u.id !== delta.id);
+    // A lista vem limitada do servidor: se saiu alguém de uma lista cheia, pede de novo
+    const faltando = urgentes.length >= LIMITE_URGENTES && restantes.length < urgentes.length && !delta.urgente;
+    if (delta.urgente) restantes.push(delta.urgente);
+    return [restantes.sort(porData).slice(0, LIMITE_URGENTES), faltando];
+  };
+
+  if (delta.modelo === 'pedido_fabrica') {
+    const pf: Record<string, any> = { ...painel.pedido_fabrica };
+    ajustar(pf, -1, antes);
+    ajustar(pf, 1, depois);
+    const [urgentes, faltando] = atualizarUrgentes(painel.pedido_fabrica.urgentes);
+    return [{ ...painel, pedido_fabrica: { ...(pf as KDSPanel['pedido_fabrica']), urgentes } }, faltando];
+  }
+
+  const dtf: Record<string, any> = { ...painel.dtf };
+  ajustar(dtf, -1, antes);
+  ajustar(dtf, 1, depois);
+  let fila_list = painel.dtf.fila_list.filter(i => i.id !== delta.id);
+  let prontos_entrega_list = painel.dtf.prontos_entrega_list.filter(i => i.id !== delta.id);
+  if (delta.item && depois?.bucket === 'fila') fila_list = [...fila_list, delta.item].sort(porData);
+  if (delta.item && depois?.bucket === 'prontos_entrega') prontos_entrega_list = [...prontos_entrega_list, delta.item].sort(porData);
+  const [urgentes, faltando] = atualizarUrgentes(painel.dtf.urgentes);
+  return [{
+    ...painel,
+    dtf: { ...(dtf as KDSPanel['dtf']), fila_list, prontos_entrega_list, urgentes },
+  }, faltando];
+}
+
 export default function Dashboard() {
   const [data, setData] = useState<KDSPanel | null>(null);
   const [loading, setLoading] = useState(true);
   const [lastUpdate, setLastUpdate] = useState<Date | null>(null);
 
-  const fetchKDS = useCallback(async () => {
-    try {
-      const res = await api.get('/kds/');
-      setData(res.data);
-      setLastUpdate(new Date());
-    } finally {
+  const dataRef = useRef<KDSPanel | null>(null);
+
+  // Snapshot ao conectar, depois só deltas (sem polling)
+  const { conectado, pedirSnapshot } = useKDSSocket((msg: KDSMensagem) => {
+    if (msg.type === 'snapshot') {
+      dataRef.current = msg.data;
       setLoading(false);
+    } else {
+      if (!dataRef.current) return;
+      const [novo, faltando] = aplicarDelta(dataRef.current, msg);
+      dataRef.current = novo;
+      if (faltando) pedirSnapshot();
     }
-  }, []);
-
-  useEffect(() => {
-    fetchKDS();
-    const interval = setInterval(fetchKDS, 30000);
-    return () => clearInterval(interval);
-  }, [fetchKDS]);
+    setData(dataRef.current);
+    setLastUpdate(new Date());
+  });
 
   const toggle = async (id: number, tipo: string, field: 'foi_impresso' | 'foi_entregue', val: any) => {
     const path = tipo === 'DTF' ? `/dtf/${id}/` : `/pedidos/${id}/`;
+    // O painel atualiza pelo delta que chega no WebSocket
     await api.patch(path, { [field]: val });
-    fetchKDS();
   };
 
   if (loading) {
@@ -194,7 +241,7 @@ export default function Dashboard() {
           { label: 'Pagos', val: dtf.pagos, cor: 'text-blue-400' },
           { label: 'Fila', val: dtf.fila, cor: 'text-yellow-400' },
           { label: 'Prontos', val: dtf.prontos_entrega, cor: 'text-orange-400' },
-          { label: 'Entregues', val: dtf.entregue, cor: 'text-emerald-400' },
+          { label: 'Entregues', val: dtf.entregues, cor: 'text-emerald-400' },
         ].map(({ label, val, cor }) => (
           <div key={label} className="bg-slate-800 rounded-xl p-3 text-center">
             <p className={`text-3xl font-black ${cor}`}>{val}</p>
@@ -225,7 +272,7 @@ export default function Dashboard() {
         </div>
         <div className="flex-1 bg-slate-800 rounded-xl px-4 py-3">
           <p className="text-[9px] text-slate-500 uppercase font-black">Entregues <span className="text-emerald-400">(hoje)</span></p>
-          <p className="text-2xl font-black text-emerald-400">{dtf.entregue}</p>
+          <p className="text-2xl font-black text-emerald-400">{dtf.entregues}</p>
         </div>
       </div>
 
@@ -273,12 +320,12 @@ export default function Dashboard() {
         <div>
           <h1 className="text-2xl font-black text-white">Painel KDS</h1>
           <p className="text-xs text-slate-500 mt-0.5">
-            Atualiza automático a cada 30s
+            {conectado ? 'Tempo real' : 'Reconectando...'}
             {lastUpdate && <span className="ml-2">· Última: {lastUpdate.toLocaleTimeString('pt-BR')}</span>}
           </p>
         </div>
         <button
-          onClick={fetchKDS}
+          onClick={pedirSnapshot}
           className="flex items-center gap-2 bg-slate-800 hover:bg-slate-700 text-slate-300 px-4 py-2 rounded-xl text-xs font-bold transition"
         >
           <RefreshCw size={14} /> Atualizar
@@ -286,7 +333,7 @@ export default function Dashboard() {
         <button
           onClick={async () => {
             await api.post('sync-status/');
-            fetchKDS();
+            pedirSnapshot();
           }}
           className="flex items-center gap-2 bg-blue-900 hover:bg-blue-800 text-blue-300 px-4 py-2 rounded-xl text-xs font-bold transition"
         >
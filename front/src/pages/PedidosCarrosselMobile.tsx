@@ -1,5 +1,6 @@
 import { useEffect, useState, useRef } from 'react';
 import { api } from '../auth/useAuth';
+import { useKDSSocket } from '../hooks/useKDSSocket';
 import { useAlert } from '../contexts/AlertContext';
 import {
   Layers,
@@ -10,6 +11,7 @@ import {
   RotateCcw,
   RefreshCw, // Importado para o botão de atualizar
 } from 'lucide-react';
+import { thumbUrl, usarOriginal } from '../tools/thumbUrl';
 
 export const PedidosCarrosselMobile = () => {
   const [pedidos, setPedidos] = useState<any[]>([]);
@@ -64,10 +66,20 @@ export const PedidosCarrosselMobile = () => {
   useEffect(() => {
     carregarPedidos();
     carregarDTFs();
-    const interval = setInterval(() => { carregarPedidos(); carregarDTFs(); }, 600000);
-    return () => clearInterval(interval);
   }, []);
 
+  // Sem polling: recarrega a lista só quando o ws/kds/ avisa que algo mudou de fila/status.
+  // Agrupa rajadas de eventos (ex.: impressão em lote) em uma única recarga.
+  const recargaTimer = useRef<{ [modelo: string]: ReturnType<typeof setTimeout> }>({});
+  useKDSSocket((msg) => {
+    if (msg.type !== 'delta') return;
+    clearTimeout(recargaTimer.current[msg.modelo]);
+    recargaTimer.current[msg.modelo] = setTimeout(
+      msg.modelo === 'dtf' ? carregarDTFs : carregarPedidos,
+      300,
+    );
+  });
+
   const carregarPedidos = async () => {
     setRefreshing(true);
     try {
@@ -233,13 +245,15 @@ export const PedidosCarrosselMobile = () => {
                 <div className="w-[60%] bg-white relative border-r border-slate-800 flex items-center justify-center overflow-hidden shadow-inner">
                   {item.layout ? (
                     <img
-                      src={item.layout}
+                      src={thumbUrl(item.layout, 1280)}
+                      onError={usarOriginal(item.layout)}
                       className="max-w-full max-h-full object-contain p-1"
                       alt="Layout"
                     />
                   ) :  item.layout_arquivo ? (
                     <img
-                      src={item.layout_arquivo}
+                      src={thumbUrl(item.layout_arquivo, 1280)}
+                      onError={usarOriginal(item.layout_arquivo)}
                       className="max-w-full max-h-full object-contain p-1"
                       alt="Layout"
                     />
@@ -9,6 +9,7 @@ import ModalEditarPedidoFabrica from '../components/ModalEditarPedidoFabrica';
 import { FilterToggle } from '../components/FilterToggle';
 import { api } from '../auth/useAuth';
 import { useState } from 'react';
+import { thumbUrl, usarOriginal } from '../tools/thumbUrl';
 
 export const PedidosFabrica = () => {
  const { items, loading, hasMore, loadMore, totalCount, setSearch, refresh } = usePaginatedList({
@@ -109,7 +110,9 @@ export const PedidosFabrica = () => {
  <div className="h-44 bg-slate-100 relative group">
  {item.layout ? (
  <img
- src={item.layout}
+ src={thumbUrl(item.layout, 640)}
+ onError={usarOriginal(item.layout)}
+ loading="lazy"
  className="w-full h-full object-contain"
  alt="Layout do Pedido"
  />
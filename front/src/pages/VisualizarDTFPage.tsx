@@ -6,6 +6,7 @@ import { formatarReal } from '../tools/formatReal';
 import logo from '../assets/logo-printcollor-blk.png';
 import html2canvas from 'html2canvas';
 import { useAlert } from '../contexts/AlertContext';
+import { thumbUrl, usarOriginal } from '../tools/thumbUrl';
 
 const VisualizarDTFPage = () => {
   const { id } = useParams();
@@ -213,7 +214,7 @@ const VisualizarDTFPage = () => {
             <span className="text-[10px] font-black text-slate-400 uppercase mb-2 flex-shrink-0">Arquivo Layout</span>
             <div className="flex-1 bg-slate-50 border-2 border-dashed border-slate-200 rounded-2xl flex items-center justify-center overflow-hidden p-2">
               {dtf?.layout_arquivo ? (
-                <img src={dtf.layout_arquivo} className="max-w-full max-h-full object-contain" alt="Layout" />
+                <img src={thumbUrl(dtf.layout_arquivo, 1280)} onError={usarOriginal(dtf.layout_arquivo)} className="max-w-full max-h-full object-contain" alt="Layout" />
               ) : (
                 <span className="text-slate-300 font-black text-xs uppercase">Sem Imagem</span>
               )}
@@ -224,7 +225,7 @@ const VisualizarDTFPage = () => {
             <span className="text-[10px] font-black text-slate-400 uppercase mb-2 flex-shrink-0">Comprovante</span>
             <div className="flex-1 bg-slate-50 border-2 border-dashed border-slate-200 rounded-2xl flex items-center justify-center overflow-hidden p-2">
               {dtf?.comprovante_pagamento ? (
-                <img src={dtf.comprovante_pagamento} className="max-w-full max-h-full object-contain" alt="Comprovante" />
+                <img src={thumbUrl(dtf.comprovante_pagamento, 1280)} onError={usarOriginal(dtf.comprovante_pagamento)} className="max-w-full max-h-full object-contain" alt="Comprovante" />
               ) : (
                 <span className="text-slate-300 font-black text-xs uppercase">Sem Comprovante</span>
               )}
@@ -0,0 +1,16 @@
+import type { SyntheticEvent } from 'react';
+
+// Tamanhos servidos pela API (lado maior, px)
+export type ThumbSize = 160 | 320 | 640 | 1280;
+
+/** URL da miniatura WebP (/api/media/thumb/<tamanho>/<caminho>) de um arquivo de /media/. */
+export const thumbUrl = (url: string, size: ThumbSize) => {
+  const i = url.indexOf('/media/');
+  if (i < 0) return url;
+  return `${import.meta.env.VITE_API_URL}media/thumb/${size}/${url.slice(i + '/media/'.length)}`;
+};
+
+/** onError da <img>: se a miniatura falhar, carrega o arquivo original. */
+export const usarOriginal = (url: string) => (e: SyntheticEvent<HTMLImageElement>) => {
+  if (e.currentTarget.src !== url) e.currentTarget.src = url;
+};